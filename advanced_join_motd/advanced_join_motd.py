@@ -1,8 +1,10 @@
-from mcdreforged.api.types import ServerInterface, PluginServerInterface
+from mcdreforged.api.event import MCDRPluginEvents
+from mcdreforged.api.types import ServerInterface, PluginServerInterface, CommandSource
 from typing import Optional, TYPE_CHECKING
 
 from advanced_join_motd.config import Configuration
 from advanced_join_motd.commands import CommandManager
+from advanced_join_motd.file_watcher import FileWatcher
 from advanced_join_motd.scheme_manager import SchemeManager
 from advanced_join_motd.utils.logger import BlossomLogger
 from advanced_join_motd.utils.translation import rtr
@@ -23,9 +25,10 @@ class AdvancedJoinMOTD:
         # self.translator = BlossomTranslator(self)
         # self.translator.register_bundled_translations()
         self.logger = BlossomLogger(self)
-        self.logger.blossom_bind_single_file()
         self.config = Configuration.load(self)
+        self.logger.blossom_bind_single_file(queued=self.config.queued_file_logging)
 
+        self.file_watcher: Optional[FileWatcher] = None
         self.scheme_manager = SchemeManager(self)
         self.command_manager = CommandManager(self)
 
@@ -41,11 +44,55 @@ class AdvancedJoinMOTD:
         if self.__verbosity:
             self.logger.debug("Verbose mode enabled")
 
+    def reload_config(self, source: Optional[CommandSource] = None) -> bool:
+        """
+        Load the config file again and apply it in place, scheme instances and caches are kept
+        :return: False if the changes can only be applied by reloading the whole plugin
+        """
+        new_config = Configuration.load(self, source_to_reply=source)
+        changed_keys = self.config.diff(new_config)
+        self.config = new_config
+        self.logger.debug(f'Config reloaded, changed keys: {", ".join(changed_keys)}')
+        if 'command_prefix' in changed_keys:
+            # Registered command roots and help message can't be replaced without reloading
+            return False
+        if 'queued_file_logging' in changed_keys:
+            self.logger.blossom_bind_single_file(queued=new_config.queued_file_logging)
+        if 'file_watcher' in changed_keys:
+            self.stop_file_watcher()
+            self.start_file_watcher()
+        # No config key affects translations or scheme files, those are refreshed by the file watcher
+        self.scheme_manager.on_config_changed(changed_keys)
+        self.command_manager.on_config_changed(changed_keys)
+        return True
+
+    def __on_config_file_changed(self):
+        if not self.reload_config():
+            self.server.reload_plugin(self.server.get_self_metadata().id)
+
+    def start_file_watcher(self):
+        options = self.config.file_watcher
+        if not options.enabled or self.file_watcher is not None:
+            return
+        self.file_watcher = FileWatcher(self, options.interval, options.debounce)
+        self.file_watcher.watch('config', self.config.file_path, self.__on_config_file_changed)
+        self.file_watcher.watch('declarative_schemes', self.scheme_manager.dir_path, self.scheme_manager.reload_declarative_schemes)
+        for scheme in self.scheme_manager.schemes.values():
+            self.scheme_manager.watch_scheme_files(scheme)
+        self.file_watcher.start()
+
+    def stop_file_watcher(self, *args, **kwargs):
+        if self.file_watcher is not None:
+            self.file_watcher.stop()
+            self.file_watcher = None
+
     def on_load(self, server: PluginServerInterface, prev_module):
         server.register_help_message(self.config.primary_prefix, rtr('help.mcdr'))
         self.logger.register_event_listeners()
         self.scheme_manager.on_load(server)
         self.command_manager.register_command()
+        self.start_file_watcher()
+        server.register_event_listener(MCDRPluginEvents.PLUGIN_UNLOADED, self.stop_file_watcher)
 
     @classmethod
     def get_instance(cls) -> "Self":
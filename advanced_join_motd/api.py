@@ -1,21 +1,35 @@
 import json
 import os.path
+import time
 from abc import ABC, abstractmethod
 from threading import RLock
-from typing import Type, Optional
+from typing import Type, Optional, Hashable
 
-import ruamel.yaml
 from mcdreforged.api.types import Info, ServerInterface, PluginServerInterface
 from mcdreforged.api.event import MCDRPluginEvents
 
 from advanced_join_motd.utils.translation import MessageText
 from advanced_join_motd.advanced_join_motd import AdvancedJoinMOTD
+from advanced_join_motd.render_cache import CacheScope
+from advanced_join_motd.condition import Condition, compile_condition, register_condition_type
+from advanced_join_motd.join_context import JoinContext, JoinLine
+from advanced_join_motd.player_history import PlayerRecord
+from advanced_join_motd.template import MOTDTemplate, register_placeholder
 from advanced_join_motd.utils import file_util
 from advanced_join_motd.utils import translation
 
 
 __all__ = [
     "AbstractJoinMOTDScheme",
+    "CacheScope",
+    "Condition",
+    "compile_condition",
+    "JoinContext",
+    "JoinLine",
+    "PlayerRecord",
+    "register_condition_type",
+    "MOTDTemplate",
+    "register_placeholder",
     "translation",
     "register_scheme"
 ]
@@ -31,6 +45,14 @@ class AbstractJoinMOTDScheme(ABC):
     def get_priority() -> int:
         return 1000
 
+    @staticmethod
+    def get_cache_scope() -> CacheScope:
+        return CacheScope.NONE
+
+    @staticmethod
+    def get_cache_ttl() -> float:
+        return 60
+
     def __init__(self, plugin_inst: AdvancedJoinMOTD, server: PluginServerInterface):
         self.__lock = RLock()
         self.__inst = plugin_inst
@@ -48,6 +70,8 @@ class AbstractJoinMOTDScheme(ABC):
     def translation_prefix(self):
         return f"{self.server.get_self_metadata().id}"
 
+    # is_enabled, get_scheme_text and get_cache_key may also be defined as (self, context: JoinContext),
+    # so facts like permission level are shared with other schemes checked for the same join
     @abstractmethod
     def is_enabled(self, player: str, info: Optional[Info] = None) -> bool:
         ...
@@ -56,6 +80,31 @@ class AbstractJoinMOTDScheme(ABC):
     def get_scheme_text(self, player: str, info: Optional[Info] = None) -> MessageText:
         ...
 
+    def get_cache_key(self, context: JoinContext) -> Optional[Hashable]:
+        """
+        Rendered text is reused for joins with the same key until TTL expires, None to skip caching
+        Override this for custom groups, the default one is decided by get_cache_scope()
+        """
+        scope = self.get_cache_scope()
+        if scope == CacheScope.GLOBAL:
+            return ()
+        if scope == CacheScope.PLAYER:
+            return context.player
+        if scope == CacheScope.LANGUAGE:
+            return context.language
+        return None
+
+    def get_player_record(self, player: str) -> Optional[PlayerRecord]:
+        """
+        Join history of a player, None if never joined or player history is disabled
+        In is_enabled and get_scheme_text it already includes the join being handled
+        """
+        player_history = self.__inst.scheme_manager.player_history
+        return None if player_history is None else player_history.get(player)
+
+    def invalidate(self):
+        self.__inst.scheme_manager.invalidate_cache(self)
+
     def get_data_folder(self):
         return self.server.get_data_folder()
 
@@ -66,8 +115,15 @@ class AbstractJoinMOTDScheme(ABC):
         _lb_rtr_prefix = _lb_rtr_prefix or f'{self.translation_prefix}.'
         return translation.rtr(translation_key, *args, _lb_rtr_prefix=_lb_rtr_prefix, **kwargs)
 
+    @property
+    def translation_folder(self):
+        return os.path.join(self.get_data_folder(), 'lang')
+
     def register_translations(self):
-        translation_folder = file_util.ensure_dir(os.path.join(self.get_data_folder(), 'lang'))
+        start = time.perf_counter()
+        translation_folder = file_util.ensure_dir(self.translation_folder)
+        compiled_folder = os.path.join(translation_folder, '.compiled')
+        compiled_count, saved_time = 0, 0.0
         self.logger.debug(f'Files in translation folder: {os.listdir(translation_folder)}')
         for file in os.listdir(translation_folder):
             path = os.path.join(translation_folder, file)
@@ -82,14 +138,22 @@ class AbstractJoinMOTDScheme(ABC):
             elif file.endswith('.yml') or file.endswith('.yaml'):
                 self.logger.debug(f'Found language file {file}')
                 lang = file[:-5] if file.endswith('.yaml') else file[:-4]
-                with open(path, encoding='utf8') as f:
-                    translation_mapping = ruamel.yaml.YAML().load(f)
+                translation_mapping, saved = translation.load_compiled_translation(path, compiled_folder)
+                if saved is not None:
+                    compiled_count += 1
+                    saved_time += saved
             if lang is not None and translation_mapping is not None:
                 self.server.register_translation(lang, {self.translation_prefix: translation_mapping})
                 self.logger.debug(f'Registered translation: {file} for scheme {self.get_name()}')
+        translation.clear_translation_cache()
+        self.logger.debug(
+            f'Registered translations for scheme {self.get_name()} in {(time.perf_counter() - start) * 1000:.1f}ms, '
+            f'{compiled_count} file(s) loaded from compiled cache, saved {saved_time * 1000:.1f}ms'
+        )
 
     def on_refresh(self):
-        self.server.reload_plugin(self.server.get_self_metadata().id)
+        self.register_translations()
+        self.invalidate()
 
     def register_event_listener(self):
         self.server.register_event_listener(MCDRPluginEvents.PLUGIN_UNLOADED, lambda server: self.__inst.scheme_manager.unregister_scheme(self))
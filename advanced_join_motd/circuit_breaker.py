@@ -0,0 +1,122 @@
+import threading
+import time
+from typing import Callable, Dict, Optional, TypeVar
+
+from mcdreforged.api.decorator import FunctionThread
+
+from advanced_join_motd.utils.misc import get_thread_prefix
+
+_T = TypeVar('_T')
+
+
+class SchemeTimeoutError(TimeoutError):
+    pass
+
+
+class CircuitBreaker:
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold: int, cooldown: float):
+        self.__failure_threshold = max(failure_threshold, 1)
+        self.__cooldown = cooldown
+        self.__lock = threading.Lock()
+        self.__state = self.CLOSED
+        # Failures in a row of each guarded call, so a passing is_enabled doesn't hide a failing render
+        self.__failures: Dict[str, int] = {}
+        self.__opened_at = 0.0
+        # Whether a call is let through in half open state and has not finished yet
+        self.__probing = False
+        self.__last_error: Optional[str] = None
+
+    @property
+    def state(self):
+        with self.__lock:
+            return self.__current_state()
+
+    @property
+    def failures(self) -> int:
+        return max(self.__failures.values(), default=0)
+
+    def get_failures(self, call: str) -> int:
+        return self.__failures.get(call, 0)
+
+    @property
+    def last_error(self):
+        return self.__last_error
+
+    @property
+    def cooldown_remaining(self) -> float:
+        with self.__lock:
+            if self.__current_state() != self.OPEN:
+                return 0.0
+            return self.__opened_at + self.__cooldown - time.monotonic()
+
+    def __current_state(self):
+        if self.__state == self.OPEN and time.monotonic() >= self.__opened_at + self.__cooldown:
+            # Cool-down is over, let the next call try again
+            self.__state = self.HALF_OPEN
+        return self.__state
+
+    def allow(self) -> bool:
+        """
+        In half open state only one call is let through, until it records a success or failure
+        """
+        with self.__lock:
+            state = self.__current_state()
+            if state == self.HALF_OPEN:
+                if self.__probing:
+                    return False
+                self.__probing = True
+            return state != self.OPEN
+
+    def record_success(self, call: str):
+        """
+        Only ends the run of failures of this call, the breaker is closed once no call is failing in a row
+        """
+        with self.__lock:
+            self.__failures.pop(call, None)
+            self.__probing = False
+            if self.failures < self.__failure_threshold:
+                self.__state = self.CLOSED
+
+    def record_failure(self, exc: Exception, call: str) -> bool:
+        """
+        :return: True if this failure opened the breaker
+        """
+        with self.__lock:
+            failures = self.__failures[call] = self.__failures.get(call, 0) + 1
+            self.__probing = False
+            self.__last_error = f'{type(exc).__name__}: {exc}'
+            if self.__state == self.HALF_OPEN or failures >= self.__failure_threshold:
+                self.__state = self.OPEN
+                self.__opened_at = time.monotonic()
+                return True
+            return False
+
+
+def call_with_timeout(func: Callable[..., _T], *args, timeout: float = 0, **kwargs) -> _T:
+    """
+    Run func with a deadline. A timed-out call cannot be killed, its thread is left running as a daemon
+    :param timeout: Deadline in seconds, call func in current thread directly if not positive
+    """
+    if timeout <= 0:
+        return func(*args, **kwargs)
+    result = []
+
+    def run():
+        try:
+            result.append((True, func(*args, **kwargs)))
+        except Exception as exc:
+            result.append((False, exc))
+
+    thread = FunctionThread(target=run, name=get_thread_prefix() + 'SchemeCall')
+    thread.start()
+    thread.join(timeout)
+    if not result:
+        raise SchemeTimeoutError(f'{getattr(func, "__qualname__", func)} did not finish in {timeout}s')
+    succeeded, value = result[0]
+    if not succeeded:
+        raise value
+    return value
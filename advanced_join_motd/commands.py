@@ -1,19 +1,24 @@
-from typing import Union, Iterable, List, TYPE_CHECKING, Optional
+import time
+from typing import Union, Iterable, List, TYPE_CHECKING, Optional, Dict, Tuple
 from mcdreforged.api.types import CommandSource, PlayerCommandSource, InfoCommandSource
 from mcdreforged.api.command import *
 from mcdreforged.api.rtext import *
 
+from advanced_join_motd.join_context import call_with_context
 from advanced_join_motd.utils.translation import htr, rtr
 
 
 if TYPE_CHECKING:
     from advanced_join_motd.advanced_join_motd import AdvancedJoinMOTD
     from advanced_join_motd.api import AbstractJoinMOTDScheme
+    from advanced_join_motd.metrics import Histogram
 
 
 class CommandManager:
     def __init__(self, plugin_inst: "AdvancedJoinMOTD"):
         self.plugin_inst = plugin_inst
+        # Literals -> required permission level, computed when registering and when the config changes
+        self.__permission_levels: Dict[Tuple[str, ...], int] = {}
 
     @property
     def server(self):
@@ -36,18 +41,31 @@ class CommandManager:
         )
 
     def reload_self(self, source: CommandSource):
+        if self.plugin_inst.reload_config(source):
+            return source.reply(rtr('loading.config_reloaded'))
         self.config.set_reloader(source)
         self.server.reload_plugin(self.server.get_self_metadata().id)
         source.reply(rtr('loading.reloaded'))
 
+    def on_config_changed(self, changed_keys: List[str]):
+        # Command tree stays registered, only the permission levels it refers to are replaced
+        if 'permission_requirements' in changed_keys or 'enable_permission_check' in changed_keys:
+            self.__permission_levels = {
+                literals: self.config.get_permission_level(*literals) for literals in self.__permission_levels.keys()
+            }
+
     def preview(self, source: InfoCommandSource, scheme_name: Optional[str] = None):
         info = source.get_info()
         player = source.player if isinstance(source, PlayerCommandSource) else None
         if scheme_name is None:
-            self.plugin_inst.scheme_manager.on_player_joined(self.plugin_inst.server, player, info)
+            self.plugin_inst.scheme_manager.generate_and_tell(self.plugin_inst.server, player, info)
+        elif scheme_name not in self.plugin_inst.scheme_manager.schemes:
+            self.reply_not_found(source, scheme_name)
         else:
             try:
-                text = "\n" + self.plugin_inst.scheme_manager.schemes[scheme_name].get_scheme_text(player, info)
+                scheme_manager = self.plugin_inst.scheme_manager
+                context = scheme_manager.create_context(player or 'Console', info)
+                text = "\n" + call_with_context(scheme_manager.schemes[scheme_name].get_scheme_text, context)
             except Exception as exc:
                 text = rtr('preview.generated_failed', scheme_name=scheme_name)
                 self.plugin_inst.logger.exception(text)
@@ -70,15 +88,23 @@ class CommandManager:
             )
         source.reply(RText.join('\n', text))
 
+    @staticmethod
+    def reply_not_found(source: CommandSource, scheme_name: str):
+        source.reply(rtr('preview.not_found', scheme_name).set_color(RColor.red))
+
     def info_scheme(self, source: CommandSource, scheme_name: str):
         scheme = self.plugin_inst.scheme_manager.schemes.get(scheme_name)
+        if scheme is None:
+            return self.reply_not_found(source, scheme_name)
         click_to_preview = rtr('info.click_to_preview.text').c(
             RAction.run_command, f'{self.config.primary_prefix} preview {scheme_name}'
         ).h(
             rtr('info.click_to_preview.hover', scheme_name)
         )
         player = source.player if isinstance(source, PlayerCommandSource) else "console"
-        avail = scheme.is_enabled(player)
+        avail = call_with_context(scheme.is_enabled, self.plugin_inst.scheme_manager.create_context(player))
+        breaker = self.plugin_inst.scheme_manager.get_breaker(scheme_name)
+        breaker_state = breaker.state
         source.reply(
             rtr(
                 'info.text',
@@ -87,14 +113,65 @@ class CommandManager:
                 plugin_ver=scheme.server.get_self_metadata().version,
                 priority=scheme.get_priority(),
                 avail=str('a' if avail else 'c') + str(avail),
+                breaker=rtr(
+                    f'info.breaker.{breaker_state}',
+                    failures=breaker.failures,
+                    remaining=round(breaker.cooldown_remaining, 1),
+                    error=breaker.last_error
+                ),
                 click_to_preview=click_to_preview
             )
         )
 
+    def show_stats(self, source: CommandSource, scheme_name: Optional[str] = None):
+        metrics = self.plugin_inst.scheme_manager.metrics
+        if metrics is None:
+            return source.reply(rtr('stats.disabled'))
+
+        def format_ms(value: float):
+            return '∞' if value == float('inf') else f'{value:g}'
+
+        def timing(histogram: Optional["Histogram"]):
+            if histogram is None or histogram.count == 0:
+                return rtr('stats.no_calls')
+            return rtr('stats.timing', count=histogram.count, mean=round(histogram.mean, 2), p99=format_ms(histogram.percentile(0.99)))
+
+        text = [rtr('stats.title', joins=metrics.joins.count, mean=round(metrics.joins.mean, 2), p99=format_ms(metrics.joins.percentile(0.99)))]
+        for name in ([scheme_name] if scheme_name is not None else metrics.scheme_names):
+            scheme_metrics = metrics.get(name)
+            if scheme_metrics is None:
+                text.append(rtr('stats.no_record', scheme_name=name))
+                continue
+            text.append(rtr(
+                'stats.scheme',
+                scheme_name=name,
+                won=scheme_metrics.won,
+                failed=scheme_metrics.failed,
+                skipped=scheme_metrics.skipped,
+                cache_hits=scheme_metrics.cache_hits,
+                enabled=timing(scheme_metrics.timings.get('is_enabled')),
+                render=timing(scheme_metrics.timings.get('get_scheme_text'))
+            ))
+            if scheme_metrics.last_error is not None:
+                text.append(rtr(
+                    'stats.last_error',
+                    error=scheme_metrics.last_error,
+                    time=time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(scheme_metrics.last_error_at))
+                ))
+        source.reply(RText.join('\n', text))
+
     def register_command(self):
         def permed_literal(literals: Union[str, Iterable[str]]) -> Literal:
             literals = {literals} if isinstance(literals, str) else set(literals)
-            return Literal(literals).requires(self.config.get_permission_checker(*literals))
+            key = tuple(sorted(literals))
+            self.__permission_levels[key] = self.config.get_permission_level(*literals)
+            return Literal(literals).requires(lambda src: src.has_permission(self.__permission_levels[key]))
+
+        # Scheme names are checked when running instead of with requires(), which would also reject
+        # the partial names typed so far and leave nothing to suggest
+        def suggest_scheme_names(src: CommandSource, ctx: CommandContext):
+            # Name typed so far, absent before anything is typed
+            return self.plugin_inst.scheme_manager.get_scheme_names(ctx.get('name', ''))
 
         root_node: Literal = Literal(self.config.prefix).runs(lambda src: self.preview(src)).requires(lambda src: isinstance(src, InfoCommandSource))
 
@@ -103,25 +180,25 @@ class CommandManager:
             permed_literal('reload').runs(lambda src: self.reload_self(src)),
             permed_literal('list').runs(lambda src: self.list_loaded(src)),
             permed_literal('info').then(
-                GreedyText('name').runs(lambda src, ctx: self.info_scheme(src, ctx['name'])).requires(
-                    lambda src, ctx: self.plugin_inst.scheme_manager.schemes.get(ctx['name']) is not None,
-                    lambda src, ctx: rtr('preview.not_found', ctx['name'])
-                ).suggests(lambda: self.plugin_inst.scheme_manager.schemes.keys())
+                GreedyText('name').runs(lambda src, ctx: self.info_scheme(src, ctx['name'])).suggests(suggest_scheme_names)
             ),
             permed_literal('preview').runs(
                 lambda src: self.preview(src)
             ).then(
-                GreedyText('name').runs(lambda src, ctx: self.preview(src, ctx['name'])).requires(
-                    lambda src, ctx: self.plugin_inst.scheme_manager.schemes.get(ctx['name']) is not None,
-                    lambda src, ctx: rtr('preview.not_found', ctx['name'])
-                ).suggests(lambda: self.plugin_inst.scheme_manager.schemes.keys())
+                GreedyText('name').runs(lambda src, ctx: self.preview(src, ctx['name'])).suggests(suggest_scheme_names)
+            ),
+            permed_literal('stats').runs(
+                lambda src: self.show_stats(src)
+            ).then(
+                GreedyText('name').runs(lambda src, ctx: self.show_stats(src, ctx['name'])).suggests(suggest_scheme_names)
             )
         ]
 
         debug_nodes: List[AbstractNode] = []
 
-        if self.config.enable_debug_commands:
-            children += debug_nodes
+        for node in debug_nodes:
+            node.requires(lambda: self.config.enable_debug_commands)
+        children += debug_nodes
 
         for node in children:
             root_node.then(node)
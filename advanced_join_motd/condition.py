@@ -0,0 +1,172 @@
+import re
+import threading
+import weakref
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+from advanced_join_motd.join_context import JoinContext
+
+
+Predicate = Callable[[JoinContext], bool]
+# Compiles the value of a condition into a hashable key identifying it and a predicate
+ConditionCompiler = Callable[[Any], Tuple[Hashable, Predicate]]
+
+
+class Condition:
+    """
+    Compiled condition, called with a JoinContext
+    Conditions equal in definition are the same object, and are evaluated once per join
+    """
+    __slots__ = ('key', 'predicate', '__weakref__')
+
+    def __init__(self, key: Hashable, predicate: Predicate):
+        self.key = key
+        self.predicate = predicate
+
+    def __call__(self, context: JoinContext) -> bool:
+        results = context.condition_results
+        result = results.get(self.key)
+        if result is None:
+            result = results[self.key] = bool(self.predicate(context))
+        return result
+
+    def __repr__(self):
+        return f'Condition{self.key}'
+
+
+_interned: "weakref.WeakValueDictionary[Hashable, Condition]" = weakref.WeakValueDictionary()
+_interned_lock = threading.Lock()
+
+
+def _intern(key: Hashable, predicate: Predicate) -> Condition:
+    with _interned_lock:
+        condition = _interned.get(key)
+        if condition is None:
+            condition = _interned[key] = Condition(key, predicate)
+        return condition
+
+
+def _parse_clock(value, divider: str) -> tuple:
+    return tuple(int(item) for item in str(value).split(divider))
+
+
+def _in_range(start: tuple, end: tuple, current: tuple) -> bool:
+    if start <= end:
+        return start <= current <= end
+    # Wraps around, e.g. across new year or midnight
+    return not end < current < start
+
+
+def _compile_players(value):
+    players = frozenset(str(item) for item in value)
+    return ('players', players), lambda context: context.player in players
+
+
+def _compile_exclude_players(value):
+    players = frozenset(str(item) for item in value)
+    return ('exclude_players', players), lambda context: context.player not in players
+
+
+def _compile_permission(value):
+    level = int(value)
+    return ('permission', level), lambda context: context.permission_level >= level
+
+
+def _compile_name_regex(value):
+    pattern = re.compile(str(value))
+    return ('name_regex', pattern.pattern), lambda context: pattern.search(context.player) is not None
+
+
+def _compile_date_range(value):
+    start, end = _parse_clock(value[0], '-'), _parse_clock(value[1], '-')
+
+    def predicate(context):
+        return _in_range(start, end, (context.now.month, context.now.day))
+    return ('date_range', start, end), predicate
+
+
+def _compile_time_range(value):
+    start, end = _parse_clock(value[0], ':'), _parse_clock(value[1], ':')
+
+    def predicate(context):
+        return _in_range(start, end, (context.now.hour, context.now.minute))
+    return ('time_range', start, end), predicate
+
+
+def _compile_weekdays(value):
+    weekdays = frozenset(int(item) for item in value)
+    return ('weekdays', weekdays), lambda context: context.now.isoweekday() in weekdays
+
+
+def _compile_min_online(value):
+    count = int(value)
+    return ('min_online', count), lambda context: context.online_count >= count
+
+
+def _compile_max_online(value):
+    count = int(value)
+    return ('max_online', count), lambda context: context.online_count <= count
+
+
+def _compile_all(value):
+    children = tuple(compile_condition(item) for item in value)
+    return ('all', tuple(child.key for child in children)), lambda context: all(child(context) for child in children)
+
+
+def _compile_any(value):
+    children = tuple(compile_condition(item) for item in value)
+    return ('any', tuple(child.key for child in children)), lambda context: any(child(context) for child in children)
+
+
+def _compile_not(value):
+    child = compile_condition(value)
+    return ('not', child.key), lambda context: not child(context)
+
+
+_COMPILERS: Dict[str, ConditionCompiler] = {
+    'players': _compile_players,
+    'exclude_players': _compile_exclude_players,
+    'permission': _compile_permission,
+    'name_regex': _compile_name_regex,
+    'date_range': _compile_date_range,
+    'time_range': _compile_time_range,
+    'weekdays': _compile_weekdays,
+    'min_online': _compile_min_online,
+    'max_online': _compile_max_online,
+    'all': _compile_all,
+    'any': _compile_any,
+    'not': _compile_not,
+}
+
+
+def register_condition_type(name: str, compiler: ConditionCompiler):
+    _COMPILERS[name] = compiler
+
+
+def compile_condition(definition: Any) -> Condition:
+    """
+    Compile a condition definition, usually loaded from yaml
+    A mapping means all of its items should be satisfied, a list means all of its elements, e.g.
+
+        any:
+          - players: [Steve, Alex]
+          - permission: 3
+        not:
+          weekdays: [6, 7]
+
+    :raise ValueError: If the definition contains unknown condition type
+    """
+    if isinstance(definition, Condition):
+        return definition
+    if isinstance(definition, (list, tuple)):
+        return _intern(*_compile_all(definition))
+    if not isinstance(definition, dict):
+        raise ValueError(f'Condition should be a mapping or a list, got {definition!r}')
+    conditions = []
+    for name, value in definition.items():
+        compiler = _COMPILERS.get(name)
+        if compiler is None:
+            raise ValueError(f'Unknown condition type "{name}"')
+        conditions.append(_intern(*compiler(value)))
+    if len(conditions) == 1:
+        return conditions[0]
+    return _intern(*_compile_all(conditions))
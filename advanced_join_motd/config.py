@@ -1,47 +1,161 @@
-from typing import Union, List, Optional
+from types import MappingProxyType
+from typing import Union, List, Optional, Dict, Tuple, NamedTuple, Mapping
 
 from advanced_join_motd.utils.serializer import BlossomSerializable, ConfigurationBase
+from advanced_join_motd.utils.translation import clear_help_cache
 
 
 class PermissionRequirements(BlossomSerializable):
     reload: int = 3
+    stats: int = 2
 
-    def get_permission(self, cmd: str, default_value: int):
-        return self.serialize().get(cmd, default_value)
+
+class GenerationOptions(BlossomSerializable):
+    # "sync": generate on MCDR task executor; "async": generate in worker threads of this plugin
+    mode: str = 'sync'
+    worker_count: int = 2
+    max_queue_size: int = 64
+    # "drop": discard the join message; "fallback": send a plain text instead
+    overflow_policy: str = 'fallback'
+
+    @property
+    def is_async(self):
+        return self.mode == 'async'
+
+    @property
+    def drop_on_overflow(self):
+        return self.overflow_policy == 'drop'
+
+
+class JoinBatchingOptions(BlossomSerializable):
+    enabled: bool = False
+    # Seconds to wait for more joins after the first one of a batch
+    window: float = 0.5
+    max_batch_size: int = 50
+
+
+class DeliveryLimitOptions(BlossomSerializable):
+    enabled: bool = False
+    # A player receives at most burst join messages in a row, then one more every refill_interval seconds
+    burst: int = 3
+    refill_interval: float = 60
+    # Seconds, the same scheme is not sent to a player again within it
+    same_scheme_interval: float = 300
+    max_records: int = 10000
+
+
+class MetricsOptions(BlossomSerializable):
+    enabled: bool = False
+    # Seconds, 0 to disable dumping
+    dump_interval: float = 0
+    # "json" or "prometheus"
+    dump_format: str = 'json'
+
+
+class SlowJoinOptions(BlossomSerializable):
+    enabled: bool = False
+    # Milliseconds
+    threshold: float = 200
+    sample_interval: float = 10
+    max_records: int = 50
+    # KiB
+    max_total_size: int = 1024
+
+
+class PlayerHistoryOptions(BlossomSerializable):
+    enabled: bool = False
+    # Seconds
+    flush_interval: float = 5
+    # The log file is compacted once it has more lines than compact_ratio times the count of players
+    compact_ratio: float = 4
+
+
+class SchemeGuardOptions(BlossomSerializable):
+    # Seconds, 0 to disable
+    timeout: float = 0
+    timeout_overrides: Dict[str, float] = {}
+    failure_threshold: int = 3
+    cooldown: float = 60
+
+    def get_timeout(self, scheme_name: str) -> float:
+        return self.timeout_overrides.get(scheme_name, self.timeout)
+
+
+class FileWatcherOptions(BlossomSerializable):
+    enabled: bool = False
+    # Seconds
+    interval: float = 2
+    debounce: float = 1
+
+
+class ConfigurationView(NamedTuple):
+    prefix: Tuple[str, ...]
+    permissions: Mapping[str, int]
+    enable_permission_check: bool
+    enable_debug_commands: bool
+    is_verbose: bool
 
 
 class Configuration(ConfigurationBase):
     command_prefix: Union[List[str], str] = ['!!ajm', '!!joinMOTD']
     permission_requirements: PermissionRequirements = PermissionRequirements.get_default()
     enable_permission_check: bool = True
+    generation: GenerationOptions = GenerationOptions.get_default()
+    join_batching: JoinBatchingOptions = JoinBatchingOptions.get_default()
+    delivery_limit: DeliveryLimitOptions = DeliveryLimitOptions.get_default()
+    metrics: MetricsOptions = MetricsOptions.get_default()
+    slow_join: SlowJoinOptions = SlowJoinOptions.get_default()
+    player_history: PlayerHistoryOptions = PlayerHistoryOptions.get_default()
+    scheme_guard: SchemeGuardOptions = SchemeGuardOptions.get_default()
+    render_cache_size: int = 256
+    queued_file_logging: bool = False
+    file_watcher: FileWatcherOptions = FileWatcherOptions.get_default()
 
     debug: bool
     verbosity: bool
 
+    def _build_view(self) -> ConfigurationView:
+        serialized = self.serialize()
+        prefix = self.command_prefix if isinstance(self.command_prefix, list) else [self.command_prefix]
+        return ConfigurationView(
+            # Deduplicated, keeping the configured order
+            prefix=tuple(dict.fromkeys(prefix)),
+            permissions=MappingProxyType(self.permission_requirements.serialize()),
+            enable_permission_check=self.enable_permission_check,
+            enable_debug_commands=serialized.get('debug', False),
+            is_verbose=serialized.get('verbosity', False)
+        )
+
     @property
-    def prefix(self) -> List[str]:
-        return list(set(self.command_prefix)) if isinstance(self.command_prefix, list) else [self.command_prefix]
+    def prefix(self) -> Tuple[str, ...]:
+        return self.view.prefix
 
     @property
     def primary_prefix(self) -> str:
-        return self.prefix[0]
+        return self.view.prefix[0]
 
     @property
     def enable_debug_commands(self):
-        return self.serialize().get('debug', False)
+        return self.view.enable_debug_commands
 
     @property
     def is_verbose(self):
-        return self.serialize().get("verbosity", False)
+        return self.view.is_verbose
 
     def after_load(self, plugin_inst):
         plugin_inst.set_verbose(self.is_verbose)
+        # Help texts are processed with the command prefixes
+        clear_help_cache()
 
-    def get_permission_checker(self, *cmd: str, default_value: int = 0):
-        if not self.enable_permission_check:
-            return lambda: True
+    def get_permission_level(self, *cmd: str, default_value: int = 0) -> int:
+        """
+        Highest level required by the commands, 0 if permission check is disabled
+        """
+        view = self.view
+        if not view.enable_permission_check:
+            return 0
         perm = default_value
         for item in cmd:
-            current_item_perm = self.permission_requirements.get_permission(item, default_value)
+            current_item_perm = view.permissions.get(item, default_value)
             perm = perm if perm >= current_item_perm else current_item_perm
-        return lambda src: src.has_permission(perm)
+        return perm
@@ -0,0 +1,170 @@
+import hashlib
+import os
+import string
+import threading
+from typing import TYPE_CHECKING, Dict, Iterable, List, NamedTuple, Optional
+
+from mcdreforged.api.rtext import RTextMCDRTranslation
+from mcdreforged.api.types import PluginServerInterface
+from ruamel import yaml
+
+from advanced_join_motd.api import AbstractJoinMOTDScheme, CacheScope
+from advanced_join_motd.condition import Condition, compile_condition
+from advanced_join_motd.join_context import JoinContext
+from advanced_join_motd.template import MOTDTemplate
+from advanced_join_motd.utils.translation import MessageText
+
+if TYPE_CHECKING:
+    from advanced_join_motd.advanced_join_motd import AdvancedJoinMOTD
+
+
+class _CompiledScheme(NamedTuple):
+    condition: Condition
+    # Language -> template, key None for text not split by language
+    templates: Dict[Optional[str], MOTDTemplate]
+
+
+class DeclarativeScheme(AbstractJoinMOTDScheme):
+    """
+    Scheme defined by a yaml file in the schemes folder, e.g.
+
+        name: new_year
+        priority: 2000
+        cache: global  # none, global, player or language
+        cache_ttl: 60
+        conditions:
+          players: [Steve, Alex]
+          exclude_players: [Herobrine]
+          permission: 1
+          date_range: [12-31, 01-01]  # month-day, both ends included
+          weekdays: [6, 7]  # 1 for Monday
+          any:  # all, any and not compose other conditions
+            - name_regex: ^bot_
+            - min_online: 10
+        text:
+          en_us: Happy new year, {player}!
+          zh_cn: 新年快乐, {player}!
+
+    Only name, priority and cache options are read and text syntax is checked at load time, conditions and text are compiled on first use
+    A scheme failing to compile is disabled with an error logged once
+    """
+    __formatter = string.Formatter()
+
+    def __init__(self, plugin_inst: "AdvancedJoinMOTD", server: PluginServerInterface, definition: dict, path: str, digest: Optional[str] = None):
+        super().__init__(plugin_inst, server)
+        self.path = path
+        # Hash of the file content, an instance is kept across reloads while it's unchanged
+        self.digest = digest
+        self.__definition = definition
+        self.__name = str(definition.get('name') or os.path.splitext(os.path.basename(path))[0])
+        self.__priority = int(definition.get('priority', 1000))
+        self.__cache_scope = CacheScope(definition.get('cache', CacheScope.NONE.value))
+        self.__cache_ttl = float(definition.get('cache_ttl', 60))
+        self.__compile_lock = threading.Lock()
+        self.__compiled: Optional[_CompiledScheme] = None
+        self.__compile_failed = False
+        # Only parsed for errors like an unbalanced "{", the result is dropped
+        text = definition['text']
+        for item in (text.values() if isinstance(text, dict) else [text]):
+            for _ in self.__formatter.parse(str(item)):
+                pass
+
+    def get_name(self) -> str:
+        return self.__name
+
+    def get_priority(self) -> int:
+        return self.__priority
+
+    def get_cache_scope(self) -> CacheScope:
+        return self.__cache_scope
+
+    def get_cache_ttl(self) -> float:
+        return self.__cache_ttl
+
+    @property
+    def compiled(self) -> Optional[_CompiledScheme]:
+        """
+        None if compiling failed
+        """
+        compiled = self.__compiled
+        if compiled is None and not self.__compile_failed:
+            with self.__compile_lock:
+                if self.__compiled is None and not self.__compile_failed:
+                    try:
+                        self.__compiled = self.__compile()
+                    except Exception as exc:
+                        self.__compile_failed = True
+                        self.logger.error(f'Failed to compile scheme file {self.path}, scheme {self.__name} is disabled: {exc}')
+                    else:
+                        self.logger.debug(f'Compiled scheme {self.__name}')
+                compiled = self.__compiled
+        return compiled
+
+    def __compile(self) -> _CompiledScheme:
+        text = self.__definition['text']
+        if isinstance(text, dict):
+            templates = {str(lang): MOTDTemplate(str(item).rstrip('\n')) for lang, item in text.items()}
+        else:
+            templates = {None: MOTDTemplate(str(text).rstrip('\n'))}
+        for template in templates.values():
+            for name in template.unknown_placeholders:
+                self.logger.warning(f'Unknown placeholder "{name}" in scheme file {self.path}')
+        return _CompiledScheme(compile_condition(self.__definition.get('conditions') or {}), templates)
+
+    def is_enabled(self, context: JoinContext) -> bool:
+        compiled = self.compiled
+        return compiled is not None and compiled.condition(context)
+
+    def get_scheme_text(self, context: JoinContext) -> MessageText:
+        compiled = self.compiled
+        if compiled is None:
+            raise ValueError(f'scheme file {self.path} failed to compile')
+        templates = compiled.templates
+        if None in templates:
+            return templates[None].render(context)
+
+        # Placeholder values are fetched once, the language is picked when the text is sent to the player
+        values = {}
+        for template in templates.values():
+            values.update(template.get_values(context))
+
+        def translate(key: str, *args, _mcdr_tr_language: Optional[str] = None, **kwargs):
+            for lang in (_mcdr_tr_language, self.server.get_mcdr_language(), 'en_us'):
+                if lang in templates:
+                    return templates[lang].render(context, values)
+            return next(iter(templates.values())).render(context, values)
+
+        return RTextMCDRTranslation('').set_translator(translate)
+
+    def on_refresh(self):
+        self.invalidate()
+
+
+def load_declarative_schemes(
+        plugin_inst: "AdvancedJoinMOTD", folder: str, previous: Iterable[DeclarativeScheme] = ()
+) -> List[DeclarativeScheme]:
+    """
+    :param previous: Schemes loaded before, returned as they are if their files did not change
+    """
+    previous = {scheme.path: scheme for scheme in previous}
+    schemes = []
+    safe_yaml = yaml.YAML(typ='safe')
+    for file in sorted(os.listdir(folder)):
+        path = os.path.join(folder, file)
+        if not os.path.isfile(path) or not (file.endswith('.yml') or file.endswith('.yaml')):
+            continue
+        try:
+            with open(path, 'rb') as f:
+                content = f.read()
+            digest = hashlib.sha256(content).hexdigest()
+            scheme = previous.get(path)
+            if scheme is not None and scheme.digest == digest:
+                schemes.append(scheme)
+                continue
+            definition = safe_yaml.load(content.decode('utf8'))
+            if not isinstance(definition, dict) or 'text' not in definition:
+                raise ValueError('scheme file should be a mapping containing key "text"')
+            schemes.append(DeclarativeScheme(plugin_inst, plugin_inst.server, definition, path, digest))
+        except Exception as exc:
+            plugin_inst.logger.error(f'Failed to load scheme file {path}: {exc}')
+    return schemes
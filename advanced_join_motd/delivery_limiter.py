@@ -0,0 +1,100 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+
+class _PlayerRecord:
+    __slots__ = ('tokens', 'refilled_at', 'scheme', 'delivered_at')
+
+    def __init__(self, tokens: float, now: float):
+        self.tokens = tokens
+        self.refilled_at = now
+        self.scheme: Optional[str] = None
+        self.delivered_at = now
+
+
+class DeliveryLimiter:
+    """
+    Limits join messages delivered to each player with a token bucket,
+    and skips a scheme delivered to the same player within same_scheme_interval seconds
+    Records are kept in delivery order, at most max_records, and dropped once they no longer limit anything
+    """
+    def __init__(self, burst: int, refill_interval: float, same_scheme_interval: float, max_records: int):
+        self.__burst = max(burst, 1)
+        self.__refill_interval = max(refill_interval, 0)
+        self.__same_scheme_interval = max(same_scheme_interval, 0)
+        self.__max_records = max(max_records, 1)
+        # A record equals a new one after the bucket is refilled and the same scheme interval passed
+        self.__expire_after = max(self.__burst * self.__refill_interval, self.__same_scheme_interval)
+        self.__lock = threading.Lock()
+        self.__records: "OrderedDict[str, _PlayerRecord]" = OrderedDict()
+
+    def __len__(self):
+        return len(self.__records)
+
+    def __get_record(self, player: str, now: float) -> Optional[_PlayerRecord]:
+        record = self.__records.get(player)
+        if record is None:
+            return None
+        if now - record.delivered_at >= self.__expire_after:
+            del self.__records[player]
+            return None
+        if self.__refill_interval > 0:
+            record.tokens = min(self.__burst, record.tokens + (now - record.refilled_at) / self.__refill_interval)
+            record.refilled_at = now
+        return record
+
+    def __add_record(self, player: str, now: float) -> _PlayerRecord:
+        records = self.__records
+        # Oldest deliveries come first, so expired records are all at the front
+        while records:
+            oldest = next(iter(records.values()))
+            if len(records) < self.__max_records and now - oldest.delivered_at < self.__expire_after:
+                break
+            records.popitem(last=False)
+        record = records[player] = _PlayerRecord(self.__burst, now)
+        return record
+
+    def is_limited(self, player: str) -> bool:
+        """
+        Whether the player has run out of tokens, checked before generating anything
+        """
+        if self.__refill_interval <= 0:
+            return False
+        with self.__lock:
+            record = self.__get_record(player, time.monotonic())
+            return record is not None and record.tokens < 1
+
+    def __is_allowed(self, record: _PlayerRecord, scheme_name: str, now: float) -> bool:
+        if self.__same_scheme_interval > 0 and record.scheme == scheme_name and now - record.delivered_at < self.__same_scheme_interval:
+            return False
+        return self.__refill_interval <= 0 or record.tokens >= 1
+
+    def can_deliver(self, player: str, scheme_name: str) -> bool:
+        """
+        Whether try_deliver would allow the delivery, without taking a token, checked before rendering
+        """
+        with self.__lock:
+            now = time.monotonic()
+            record = self.__get_record(player, now)
+            return record is None or self.__is_allowed(record, scheme_name, now)
+
+    def try_deliver(self, player: str, scheme_name: str) -> bool:
+        """
+        Take a token and record the scheme if the delivery is allowed, called once the text is ready
+        """
+        with self.__lock:
+            now = time.monotonic()
+            record = self.__get_record(player, now)
+            if record is None:
+                record = self.__add_record(player, now)
+            else:
+                if not self.__is_allowed(record, scheme_name, now):
+                    return False
+                self.__records.move_to_end(player)
+            if self.__refill_interval > 0:
+                record.tokens -= 1
+            record.scheme = scheme_name
+            record.delivered_at = now
+            return True
@@ -0,0 +1,110 @@
+import hashlib
+import os
+import threading
+import time
+from typing import TYPE_CHECKING, Callable, Dict, NamedTuple, Optional
+
+from advanced_join_motd.utils.misc import named_thread
+
+if TYPE_CHECKING:
+    from advanced_join_motd.advanced_join_motd import AdvancedJoinMOTD
+
+
+class FileSignature(NamedTuple):
+    mtime_ns: int
+    size: int
+    digest: str
+
+
+class WatchTarget:
+    def __init__(self, path: str, callback: Callable[[], None]):
+        self.path = path
+        self.callback = callback
+        self.signatures: Dict[str, FileSignature] = {}
+        self.changed_at: Optional[float] = None
+
+
+class FileWatcher:
+    """
+    Polls watched files, or files directly inside watched folders, in a single background thread
+    A burst of changes triggers the callback once, after nothing changes for the debounce time
+    """
+    def __init__(self, plugin_inst: "AdvancedJoinMOTD", interval: float, debounce: float):
+        self.__inst = plugin_inst
+        self.__interval = max(interval, 0.1)
+        self.__debounce = debounce
+        self.__targets: Dict[str, WatchTarget] = {}
+        self.__lock = threading.Lock()
+        self.__stop_event = threading.Event()
+        self.__thread = None
+
+    def watch(self, key: str, path: str, callback: Callable[[], None]):
+        target = WatchTarget(path, callback)
+        target.signatures = self.__scan(path, {})
+        with self.__lock:
+            self.__targets[key] = target
+
+    def unwatch(self, key: str):
+        with self.__lock:
+            self.__targets.pop(key, None)
+
+    def start(self):
+        if self.__thread is None:
+            self.__thread = named_thread('FileWatcher')(self.__run)()
+
+    def stop(self):
+        self.__stop_event.set()
+        self.__thread = None
+
+    @staticmethod
+    def __scan(path: str, previous: Dict[str, FileSignature]) -> Dict[str, FileSignature]:
+        if os.path.isdir(path):
+            files = [os.path.join(path, file) for file in os.listdir(path)]
+        else:
+            files = [path]
+        signatures = {}
+        for file in files:
+            try:
+                stat = os.stat(file)
+            except OSError:
+                continue
+            if not os.path.isfile(file):
+                continue
+            old = previous.get(file)
+            if old is not None and old.mtime_ns == stat.st_mtime_ns and old.size == stat.st_size:
+                signatures[file] = old
+                continue
+            # Only hash files whose stat changed, touching a file without changing it is not a change
+            try:
+                with open(file, 'rb') as f:
+                    digest = hashlib.sha1(f.read()).hexdigest()
+            except OSError:
+                continue
+            signatures[file] = FileSignature(stat.st_mtime_ns, stat.st_size, digest)
+        return signatures
+
+    def __check(self, target: WatchTarget):
+        signatures = self.__scan(target.path, target.signatures)
+        old_digests = {file: signature.digest for file, signature in target.signatures.items()}
+        new_digests = {file: signature.digest for file, signature in signatures.items()}
+        target.signatures = signatures
+        now = time.monotonic()
+        if old_digests != new_digests:
+            target.changed_at = now
+            return
+        if target.changed_at is not None and now - target.changed_at >= self.__debounce:
+            target.changed_at = None
+            self.__inst.logger.debug(f'Change detected in {target.path}')
+            try:
+                target.callback()
+            except Exception as exc:
+                self.__inst.logger.exception(f'Error handling change of {target.path}', exc_info=exc)
+            # Absorb writes made by the callback itself, e.g. fixed config being saved
+            target.signatures = self.__scan(target.path, target.signatures)
+
+    def __run(self):
+        while not self.__stop_event.wait(self.__interval):
+            with self.__lock:
+                targets = list(self.__targets.values())
+            for target in targets:
+                self.__check(target)
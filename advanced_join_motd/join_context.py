@@ -0,0 +1,143 @@
+import datetime
+import functools
+import inspect
+import re
+from typing import TYPE_CHECKING, Any, Callable, Dict, Hashable, NamedTuple, Optional, Tuple
+
+from mcdreforged.api.types import Info
+
+if TYPE_CHECKING:
+    from advanced_join_motd.advanced_join_motd import AdvancedJoinMOTD
+    from advanced_join_motd.player_history import PlayerRecord
+    from advanced_join_motd.slow_join import JoinTrace
+
+
+class _lazy:
+    """
+    Computed on first access then stored on the instance, concurrent first accesses may compute twice
+    """
+    def __init__(self, func: Callable[[Any], Any]):
+        self.__func = func
+        self.__doc__ = func.__doc__
+
+    def __set_name__(self, owner, name: str):
+        self.__name = name
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        value = instance.__dict__[self.__name] = self.__func(instance)
+        return value
+
+
+# Steve[/127.0.0.1:9864] logged in with entity id 131 at (187.2703, 146.79014, 404.84718)
+# Steve[/[2001:db8::1]:9864] logged in with entity id 131 at ([world]187.2703, 146.79014, 404.84718)
+# Steve [local] logged in with entity id 131 at (187.2703, 146.79014, 404.84718)
+_JOIN_LINE_PATTERN = re.compile(
+    r'(?P<name>[^\[ ]+) ?\[/?(?P<address>.*?)] logged in with entity id (?P<entity_id>-?\d+)'
+    r' at \((?:\[(?P<world>[^\]]*)])?(?P<x>[^,]+), (?P<y>[^,]+), (?P<z>[^)]+)\)'
+)
+_ADDRESS_PATTERN = re.compile(r'\[?(?P<host>[^\]]+?)]?:(?P<port>\d+)')
+
+
+class JoinLine(NamedTuple):
+    """
+    The "logged in with entity id" line of a join
+    """
+    name: str
+    # e.g. "127.0.0.1:9864", "[2001:db8::1]:9864", or "local" and "IP hidden" without host and port
+    address: str
+    entity_id: int
+    position: Tuple[float, float, float]
+    # Only logged by Bukkit based servers
+    world: Optional[str] = None
+
+    @property
+    def host(self) -> Optional[str]:
+        match = _ADDRESS_PATTERN.fullmatch(self.address)
+        return None if match is None else match.group('host')
+
+    @property
+    def port(self) -> Optional[int]:
+        match = _ADDRESS_PATTERN.fullmatch(self.address)
+        return None if match is None else int(match.group('port'))
+
+
+def parse_join_line(content: str) -> Optional[JoinLine]:
+    match = _JOIN_LINE_PATTERN.match(content)
+    if match is None:
+        return None
+    try:
+        position = (float(match.group('x')), float(match.group('y')), float(match.group('z')))
+    except ValueError:
+        return None
+    return JoinLine(match.group('name'), match.group('address'), int(match.group('entity_id')), position, match.group('world'))
+
+
+class JoinContext:
+    """
+    Facts about one join, built once by SchemeManager and shared by every scheme checked or rendered for it
+    Fields other than plugin_inst, player and info are computed on first access
+    """
+    def __init__(self, plugin_inst: "AdvancedJoinMOTD", player: str, info: Optional[Info] = None):
+        self.plugin_inst = plugin_inst
+        self.player = player
+        self.info = info
+        # Results of compiled conditions, shared by schemes with the same sub-conditions
+        self.condition_results: Dict[Hashable, bool] = {}
+        # Set by SchemeManager while the slow join recorder is enabled
+        self.trace: Optional["JoinTrace"] = None
+
+    def __repr__(self):
+        return f'JoinContext(player={self.player!r})'
+
+    @_lazy
+    def permission_level(self) -> int:
+        return self.plugin_inst.server.get_permission_level(self.player)
+
+    @_lazy
+    def language(self) -> str:
+        return self.plugin_inst.server.get_preference(self.player).language
+
+    @_lazy
+    def online_count(self) -> int:
+        return len(self.plugin_inst.scheme_manager.online_players)
+
+    @_lazy
+    def join_line(self) -> Optional[JoinLine]:
+        """
+        Parsed from info, None for previews or servers logging joins differently
+        """
+        if self.info is None or self.info.content is None:
+            return None
+        return parse_join_line(self.info.content)
+
+    @_lazy
+    def history(self) -> Optional["PlayerRecord"]:
+        """
+        Join history including the current join, None if player history is disabled
+        """
+        player_history = self.plugin_inst.scheme_manager.player_history
+        return None if player_history is None else player_history.get(self.player)
+
+    @_lazy
+    def now(self) -> datetime.datetime:
+        return datetime.datetime.now()
+
+
+@functools.lru_cache(maxsize=None)
+def _accepts_context(func) -> bool:
+    parameters = [item for item in inspect.signature(func).parameters.values() if item.name != 'self']
+    if not parameters:
+        return False
+    return parameters[0].name == 'context' or parameters[0].annotation in (JoinContext, 'JoinContext')
+
+
+def call_with_context(method: Callable, context: JoinContext):
+    """
+    Call a scheme method with the join context,
+    methods with the legacy (player, info) signature are called with context.player and context.info instead
+    """
+    if _accepts_context(getattr(method, '__func__', method)):
+        return method(context)
+    return method(context.player, context.info)
@@ -0,0 +1,208 @@
+import bisect
+import json
+import os
+import threading
+import time
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+from advanced_join_motd.utils import file_util
+from advanced_join_motd.utils.misc import named_thread
+
+if TYPE_CHECKING:
+    from advanced_join_motd.advanced_join_motd import AdvancedJoinMOTD
+
+
+# Upper bounds of histogram buckets in milliseconds, the last bucket holds everything slower
+BUCKET_BOUNDS: Tuple[float, ...] = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000)
+
+
+class Histogram:
+    __slots__ = ('counts', 'count', 'total')
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKET_BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, milliseconds: float):
+        self.counts[bisect.bisect_left(BUCKET_BOUNDS, milliseconds)] += 1
+        self.count += 1
+        self.total += milliseconds
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, ratio: float) -> float:
+        """
+        Upper bound of the bucket holding the given percentile, inf if it's in the last bucket
+        """
+        if self.count == 0:
+            return 0.0
+        target, seen = ratio * self.count, 0
+        for num, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                return BUCKET_BOUNDS[num] if num < len(BUCKET_BOUNDS) else float('inf')
+        return float('inf')
+
+    def to_dict(self) -> dict:
+        return {'count': self.count, 'sum_ms': self.total, 'buckets': self.counts.copy()}
+
+
+class SchemeMetrics:
+    __slots__ = ('timings', 'won', 'failed', 'skipped', 'cache_hits', 'last_error', 'last_error_at')
+
+    def __init__(self):
+        # Method name -> call time
+        self.timings: Dict[str, Histogram] = {}
+        self.won = 0
+        self.failed = 0
+        # Not called because the circuit breaker is open
+        self.skipped = 0
+        self.cache_hits = 0
+        self.last_error: Optional[str] = None
+        self.last_error_at: Optional[float] = None
+
+    def to_dict(self) -> dict:
+        return {
+            'timings': {method: histogram.to_dict() for method, histogram in self.timings.items()},
+            'won': self.won,
+            'failed': self.failed,
+            'skipped': self.skipped,
+            'cache_hits': self.cache_hits,
+            'last_error': self.last_error,
+            'last_error_at': self.last_error_at
+        }
+
+
+def _escape_label(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class MetricsRegistry:
+    """
+    Per scheme timing histograms and counters of the join path
+    SchemeManager only holds one while metrics are enabled, so nothing is timed otherwise
+    """
+    def __init__(self):
+        self.__lock = threading.Lock()
+        self.__schemes: Dict[str, SchemeMetrics] = {}
+        self.joins = Histogram()
+        self.started_at = time.time()
+
+    def __get(self, scheme_name: str) -> SchemeMetrics:
+        metrics = self.__schemes.get(scheme_name)
+        if metrics is None:
+            metrics = self.__schemes[scheme_name] = SchemeMetrics()
+        return metrics
+
+    def observe_call(self, scheme_name: str, method: str, milliseconds: float, error: Optional[BaseException] = None):
+        with self.__lock:
+            metrics = self.__get(scheme_name)
+            histogram = metrics.timings.get(method)
+            if histogram is None:
+                histogram = metrics.timings[method] = Histogram()
+            histogram.observe(milliseconds)
+            if error is not None:
+                metrics.failed += 1
+                metrics.last_error = f'{type(error).__name__}: {error}'
+                metrics.last_error_at = time.time()
+
+    def observe_join(self, milliseconds: float):
+        with self.__lock:
+            self.joins.observe(milliseconds)
+
+    def count_won(self, scheme_name: str):
+        with self.__lock:
+            self.__get(scheme_name).won += 1
+
+    def count_skipped(self, scheme_name: str):
+        with self.__lock:
+            self.__get(scheme_name).skipped += 1
+
+    def count_cache_hit(self, scheme_name: str):
+        with self.__lock:
+            self.__get(scheme_name).cache_hits += 1
+
+    def get(self, scheme_name: str) -> Optional[SchemeMetrics]:
+        return self.__schemes.get(scheme_name)
+
+    @property
+    def scheme_names(self) -> List[str]:
+        return sorted(self.__schemes.keys())
+
+    def remove(self, scheme_name: str):
+        with self.__lock:
+            self.__schemes.pop(scheme_name, None)
+
+    def to_dict(self) -> dict:
+        with self.__lock:
+            return {
+                'started_at': self.started_at,
+                'joins': self.joins.to_dict(),
+                'bucket_bounds_ms': list(BUCKET_BOUNDS),
+                'schemes': {name: metrics.to_dict() for name, metrics in self.__schemes.items()}
+            }
+
+    def to_prometheus(self) -> str:
+        data = self.to_dict()
+        lines = []
+
+        def add_histogram(metric: str, labels: str, histogram: dict):
+            cumulative = 0
+            for bound, count in zip(list(BUCKET_BOUNDS) + ['+Inf'], histogram['buckets']):
+                cumulative += count
+                lines.append(f'{metric}_bucket{{{labels}{"," if labels else ""}le="{bound}"}} {cumulative}')
+            label_part = f'{{{labels}}}' if labels else ''
+            lines.append(f'{metric}_sum{label_part} {histogram["sum_ms"]}')
+            lines.append(f'{metric}_count{label_part} {histogram["count"]}')
+
+        lines.append('# TYPE ajm_join_milliseconds histogram')
+        add_histogram('ajm_join_milliseconds', '', data['joins'])
+        lines.append('# TYPE ajm_scheme_call_milliseconds histogram')
+        for name, metrics in data['schemes'].items():
+            for method, histogram in metrics['timings'].items():
+                add_histogram('ajm_scheme_call_milliseconds', f'scheme="{_escape_label(name)}",method="{_escape_label(method)}"', histogram)
+        for counter in ('won', 'failed', 'skipped', 'cache_hits'):
+            lines.append(f'# TYPE ajm_scheme_{counter}_total counter')
+            for name, metrics in data['schemes'].items():
+                lines.append(f'ajm_scheme_{counter}_total{{scheme="{_escape_label(name)}"}} {metrics[counter]}')
+        return '\n'.join(lines) + '\n'
+
+
+class MetricsDumper:
+    """
+    Writes metrics into the data folder every interval seconds, in json or prometheus text format
+    """
+    def __init__(self, plugin_inst: "AdvancedJoinMOTD", registry: MetricsRegistry, interval: float, dump_format: str):
+        self.__inst = plugin_inst
+        self.__registry = registry
+        self.__interval = max(interval, 1)
+        self.__format = dump_format
+        self.__stop_event = threading.Event()
+
+    @property
+    def file_path(self) -> str:
+        return os.path.join(self.__inst.get_data_folder(), 'metrics.prom' if self.__format == 'prometheus' else 'metrics.json')
+
+    def dump(self):
+        if self.__format == 'prometheus':
+            content = self.__registry.to_prometheus()
+        else:
+            content = json.dumps(self.__registry.to_dict(), indent=2, ensure_ascii=False)
+        with file_util.safe_write(self.file_path) as f:
+            f.write(content)
+
+    def start(self):
+        named_thread('MetricsDumper')(self.__run)()
+
+    def stop(self):
+        self.__stop_event.set()
+
+    def __run(self):
+        while not self.__stop_event.wait(self.__interval):
+            try:
+                self.dump()
+            except Exception as exc:
+                self.__inst.logger.warning(f'Failed to dump metrics to {self.file_path}: {exc}')
@@ -0,0 +1,156 @@
+import json
+import os
+import threading
+import time
+from typing import TYPE_CHECKING, Dict, List, Optional
+
+from advanced_join_motd.utils import file_util
+from advanced_join_motd.utils.misc import named_thread
+
+if TYPE_CHECKING:
+    from advanced_join_motd.advanced_join_motd import AdvancedJoinMOTD
+
+
+class PlayerRecord:
+    """
+    Join history of a player, times are unix timestamps in seconds
+    Replaced instead of mutated on each join, so a record got by a scheme never changes
+    """
+    __slots__ = ('first_seen', 'last_seen', 'previous_seen', 'join_count')
+
+    def __init__(self, first_seen: float, last_seen: float, previous_seen: Optional[float], join_count: int):
+        self.first_seen = first_seen
+        self.last_seen = last_seen
+        # Last join before the latest one, None for the first join
+        self.previous_seen = previous_seen
+        self.join_count = join_count
+
+    def __repr__(self):
+        return f'PlayerRecord(first_seen={self.first_seen}, last_seen={self.last_seen}, previous_seen={self.previous_seen}, join_count={self.join_count})'
+
+    @property
+    def is_first_join(self) -> bool:
+        return self.join_count <= 1
+
+    @property
+    def absent_time(self) -> Optional[float]:
+        """
+        Seconds between the latest join and the one before, None for the first join
+        """
+        return None if self.previous_seen is None else self.last_seen - self.previous_seen
+
+    def to_line(self, player: str) -> str:
+        return json.dumps([player, self.first_seen, self.last_seen, self.previous_seen, self.join_count], ensure_ascii=False) + '\n'
+
+
+class PlayerHistory:
+    """
+    First seen, last seen and join count of every player, kept in memory
+    New records are appended to a log file in the data folder every flush_interval seconds by a background thread,
+    the log is rewritten with one line per player once it has more than compact_ratio lines per player
+    """
+    FILE = 'player_history.jsonl'
+
+    def __init__(self, plugin_inst: "AdvancedJoinMOTD", flush_interval: float, compact_ratio: float):
+        self.__inst = plugin_inst
+        self.__flush_interval = max(flush_interval, 0.1)
+        self.__compact_ratio = max(compact_ratio, 1)
+        self.__records: Dict[str, PlayerRecord] = {}
+        # Players joined since the last flush, in joining order
+        self.__pending: Dict[str, None] = {}
+        self.__log_lines = 0
+        self.__lock = threading.Lock()
+        # Held through a whole flush, so lines are written in joining order
+        self.__write_lock = threading.Lock()
+        self.__stop_event = threading.Event()
+
+    @property
+    def file_path(self) -> str:
+        return os.path.join(self.__inst.get_data_folder(), self.FILE)
+
+    def __len__(self):
+        return len(self.__records)
+
+    def get(self, player: str) -> Optional[PlayerRecord]:
+        return self.__records.get(player)
+
+    def record_join(self, player: str, now: Optional[float] = None) -> PlayerRecord:
+        now = time.time() if now is None else now
+        with self.__lock:
+            old = self.__records.get(player)
+            if old is None:
+                record = PlayerRecord(now, now, None, 1)
+            else:
+                record = PlayerRecord(old.first_seen, now, old.last_seen, old.join_count + 1)
+            self.__records[player] = record
+            self.__pending.pop(player, None)
+            self.__pending[player] = None
+        return record
+
+    def load(self):
+        records, lines = {}, 0
+        try:
+            with open(self.file_path, encoding='utf8') as f:
+                for line in f:
+                    lines += 1
+                    try:
+                        player, first_seen, last_seen, previous_seen, join_count = json.loads(line)
+                    except ValueError:
+                        # e.g. the last line cut off by a crash
+                        continue
+                    records[player] = PlayerRecord(first_seen, last_seen, previous_seen, join_count)
+        except FileNotFoundError:
+            pass
+        with self.__lock:
+            # Joins recorded before loading finished are newer than the file
+            records.update(self.__records)
+            self.__records = records
+            self.__log_lines = lines
+        self.__inst.logger.debug(f'Loaded join history of {len(records)} players from {lines} lines')
+
+    def flush(self):
+        with self.__write_lock:
+            with self.__lock:
+                if not self.__pending:
+                    return
+                compact = self.__log_lines + len(self.__pending) > len(self.__records) * self.__compact_ratio
+                pending: List[str] = list(self.__pending.keys())
+                lines = [self.__records[player].to_line(player) for player in (self.__records.keys() if compact else pending)]
+                self.__pending.clear()
+            try:
+                if compact:
+                    with file_util.safe_write(self.file_path) as f:
+                        f.writelines(lines)
+                else:
+                    with open(self.file_path, 'a', encoding='utf8') as f:
+                        f.writelines(lines)
+            except Exception:
+                with self.__lock:
+                    # Written again by the next flush, ahead of players joined since
+                    self.__pending = {**dict.fromkeys(pending), **self.__pending}
+                raise
+            if compact:
+                self.__log_lines = len(lines)
+                self.__inst.logger.debug(f'Compacted join history into {len(lines)} lines')
+            else:
+                self.__log_lines += len(lines)
+
+    def start(self):
+        named_thread('PlayerHistoryFlusher')(self.__run)()
+
+    def stop(self):
+        """
+        Stop the flushing thread, then write what's left in the calling thread
+        """
+        self.__stop_event.set()
+        self.__try_flush()
+
+    def __try_flush(self):
+        try:
+            self.flush()
+        except Exception as exc:
+            self.__inst.logger.warning(f'Failed to write join history to {self.file_path}: {exc}')
+
+    def __run(self):
+        while not self.__stop_event.wait(self.__flush_interval):
+            self.__try_flush()
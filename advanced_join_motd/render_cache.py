@@ -0,0 +1,87 @@
+import enum
+import threading
+import time
+from collections import OrderedDict
+from typing import Hashable, Optional, Tuple
+
+from advanced_join_motd.utils.translation import MessageText
+
+
+class CacheScope(enum.Enum):
+    NONE = 'none'
+    GLOBAL = 'global'
+    PLAYER = 'player'
+    LANGUAGE = 'language'
+
+
+class RenderCache:
+    """
+    LRU of rendered scheme text, keyed by (scheme name, scheme cache key), entries expire after their TTL
+    """
+    def __init__(self, max_size: int):
+        self.__max_size = max_size
+        self.__lock = threading.Lock()
+        self.__entries: "OrderedDict[Tuple[str, Hashable], Tuple[float, MessageText]]" = OrderedDict()
+        # Player -> entry of the scheme chosen for the last join, kept as many as entries
+        self.__chosen: "OrderedDict[str, Tuple[str, Hashable]]" = OrderedDict()
+
+    def __len__(self):
+        return len(self.__entries)
+
+    def get(self, scheme_name: str, key: Hashable) -> Optional[MessageText]:
+        with self.__lock:
+            entry = self.__entries.get((scheme_name, key))
+            if entry is None:
+                return None
+            expire_at, text = entry
+            if expire_at <= time.monotonic():
+                del self.__entries[(scheme_name, key)]
+                return None
+            self.__entries.move_to_end((scheme_name, key))
+            return text
+
+    def set_chosen(self, player: str, scheme_name: str, key: Optional[Hashable]):
+        """
+        :param key: None if the chosen scheme does not cache its text
+        """
+        with self.__lock:
+            if key is None or self.__max_size <= 0:
+                self.__chosen.pop(player, None)
+                return
+            self.__chosen[player] = (scheme_name, key)
+            self.__chosen.move_to_end(player)
+            while len(self.__chosen) > self.__max_size:
+                self.__chosen.popitem(last=False)
+
+    def get_chosen(self, player: str) -> Optional[MessageText]:
+        """
+        Cached text of the scheme chosen for the last join of the player, without asking any scheme
+        """
+        chosen = self.__chosen.get(player)
+        return None if chosen is None else self.get(*chosen)
+
+    def put(self, scheme_name: str, key: Hashable, text: MessageText, ttl: float):
+        if self.__max_size <= 0 or ttl <= 0:
+            return
+        with self.__lock:
+            self.__entries[(scheme_name, key)] = (time.monotonic() + ttl, text)
+            self.__entries.move_to_end((scheme_name, key))
+            while len(self.__entries) > self.__max_size:
+                self.__entries.popitem(last=False)
+
+    def resize(self, max_size: int):
+        with self.__lock:
+            self.__max_size = max_size
+            while len(self.__entries) > max(max_size, 0):
+                self.__entries.popitem(last=False)
+            while len(self.__chosen) > max(max_size, 0):
+                self.__chosen.popitem(last=False)
+
+    def invalidate(self, scheme_name: Optional[str] = None):
+        with self.__lock:
+            if scheme_name is None:
+                self.__entries.clear()
+                self.__chosen.clear()
+                return
+            for entry_key in [k for k in self.__entries.keys() if k[0] == scheme_name]:
+                del self.__entries[entry_key]
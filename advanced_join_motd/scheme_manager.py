@@ -1,17 +1,29 @@
+import bisect
 import importlib
 import importlib.util
 import os
+import re
 from pathlib import Path
-from typing import TYPE_CHECKING, Dict, Type, Iterable, Optional
+from typing import TYPE_CHECKING, Dict, Hashable, Type, Iterator, Optional, Tuple, List, Set
 import gc
 import sys
+import time
 
 from mcdreforged.api.event import MCDRPluginEvents
 from mcdreforged.api.types import PluginServerInterface, Info
 from mcdreforged.api.rtext import RColor
 
+from advanced_join_motd.circuit_breaker import CircuitBreaker, call_with_timeout
+from advanced_join_motd.delivery_limiter import DeliveryLimiter
+from advanced_join_motd.join_context import JoinContext, call_with_context
+from advanced_join_motd.metrics import MetricsDumper, MetricsRegistry
+from advanced_join_motd.player_history import PlayerHistory
+from advanced_join_motd.render_cache import RenderCache
+from advanced_join_motd.slow_join import SlowJoinRecorder
 from advanced_join_motd.utils import file_util
-from advanced_join_motd.utils.translation import rtr, MessageText
+from advanced_join_motd.utils.translation import rtr, MessageText, clear_translation_cache
+from advanced_join_motd.utils.batcher import Batcher
+from advanced_join_motd.utils.worker_pool import OrderedWorkerPool
 
 if TYPE_CHECKING:
     from advanced_join_motd.advanced_join_motd import AdvancedJoinMOTD
@@ -20,11 +32,32 @@ if TYPE_CHECKING:
 
 class SchemeManager:
     DIR = 'schemes'
+    # There are 2 of a max of 20 players online: Steve, Alex
+    # There are 2/20 players online:\nSteve, Alex (before 1.13)
+    __PLAYER_LIST_PATTERN = re.compile(r'players online:(.*)', re.DOTALL)
 
     def __init__(self, plugin_inst: "AdvancedJoinMOTD"):
         self.__inst = plugin_inst
         self.__schemes: Dict[str, "AbstractJoinMOTDScheme"] = {}
+        # Descending by priority, ties keep registration order. Replaced instead of mutated,
+        # so a join being handled iterates a consistent snapshot
+        self.__priority_index: Tuple["AbstractJoinMOTDScheme", ...] = ()
+        self.__priority_keys: Tuple[int, ...] = ()
+        # Sorted names for command suggestions, replaced the same way
+        self.__name_index: Tuple[str, ...] = ()
+        self.__breakers: Dict[str, CircuitBreaker] = {}
+        self.__render_cache = RenderCache(plugin_inst.config.render_cache_size)
         self.__modules = {}
+        self.__worker_pool: Optional[OrderedWorkerPool] = None
+        self.__delivery_limiter: Optional[DeliveryLimiter] = None
+        self.__metrics: Optional[MetricsRegistry] = None
+        self.__metrics_dumper: Optional[MetricsDumper] = None
+        self.__slow_join_recorder: Optional[SlowJoinRecorder] = None
+        self.__player_history: Optional[PlayerHistory] = None
+        self.__join_batcher: Optional[Batcher[Tuple[PluginServerInterface, Optional[str], Optional[Info]]]] = None
+        # Used as online player count. Players already online on load are only known when RCON is enabled,
+        # otherwise they are counted from their next join
+        self.__online_players: Set[str] = set()
         file_util.ensure_dir(self.dir_path)
 
     @property
@@ -35,20 +68,95 @@ class SchemeManager:
     def schemes(self):
         return self.__schemes
 
+    @property
+    def priority_index(self) -> Tuple["AbstractJoinMOTDScheme", ...]:
+        return self.__priority_index
+
+    def get_scheme_names(self, prefix: str = '') -> Tuple[str, ...]:
+        """
+        Sorted names of registered schemes starting with prefix
+        """
+        names = self.__name_index
+        if not prefix:
+            return names
+        start = bisect.bisect_left(names, prefix)
+        return names[start:bisect.bisect_right(names, prefix + '\U0010ffff', start)]
+
+    def get_breaker(self, scheme_name: str) -> Optional[CircuitBreaker]:
+        return self.__breakers.get(scheme_name)
+
+    def invalidate_cache(self, scheme: Optional["AbstractJoinMOTDScheme"] = None):
+        self.__render_cache.invalidate(None if scheme is None else scheme.get_name())
+
     def get_dir_module_path(self, *args):
         return '.'.join(list(Path(self.dir_path).parts) + list(args))
 
+    @property
+    def online_players(self) -> Set[str]:
+        return self.__online_players
+
     def register_scheme(self, scheme: Type["AbstractJoinMOTDScheme"], server: PluginServerInterface):
         if scheme.get_name() in self.__schemes.keys():
             return self.__inst.logger.error(f"Duplicated name scheme found: {scheme.get_name()}")
-        scheme_instance = scheme(self.__inst, server)
-        self.__schemes[scheme.get_name()] = scheme_instance
-        self.__inst.logger.info(f'Registered scheme {scheme.get_name()}')
+        return self.register_scheme_instance(scheme(self.__inst, server))
+
+    def register_scheme_instance(self, scheme_instance: "AbstractJoinMOTDScheme"):
+        name = scheme_instance.get_name()
+        if name in self.__schemes.keys():
+            return self.__inst.logger.error(f"Duplicated name scheme found: {name}")
+        self.__schemes[name] = scheme_instance
+        options = self.__inst.config.scheme_guard
+        self.__breakers[name] = CircuitBreaker(options.failure_threshold, options.cooldown)
+        self.__index_scheme(scheme_instance)
+        self.watch_scheme_files(scheme_instance)
+        self.__inst.logger.info(f'Registered scheme {name}')
         return scheme_instance
 
+    def watch_scheme_files(self, scheme: "AbstractJoinMOTDScheme"):
+        from advanced_join_motd.declarative import DeclarativeScheme
+        # Declarative scheme files are watched as a whole folder
+        if self.__inst.file_watcher is not None and not isinstance(scheme, DeclarativeScheme):
+            self.__inst.file_watcher.watch(f'scheme:{scheme.get_name()}', scheme.translation_folder, scheme.on_refresh)
+
     def unregister_scheme(self, scheme: "AbstractJoinMOTDScheme"):
         name = scheme.get_name()
-        del self.__schemes[name]
+        scheme_instance = self.__schemes.pop(name, None)
+        if scheme_instance is not None:
+            if self.__inst.file_watcher is not None:
+                self.__inst.file_watcher.unwatch(f'scheme:{name}')
+            self.__breakers.pop(name, None)
+            if self.__metrics is not None:
+                self.__metrics.remove(name)
+            self.__render_cache.invalidate(name)
+            self.__unindex_scheme(scheme_instance)
+            clear_translation_cache()
+
+    def __index_scheme(self, scheme: "AbstractJoinMOTDScheme"):
+        key = -scheme.get_priority()
+        position = bisect.bisect_right(self.__priority_keys, key)
+        self.__priority_keys = self.__priority_keys[:position] + (key,) + self.__priority_keys[position:]
+        self.__priority_index = self.__priority_index[:position] + (scheme,) + self.__priority_index[position:]
+        name = scheme.get_name()
+        position = bisect.bisect_left(self.__name_index, name)
+        self.__name_index = self.__name_index[:position] + (name,) + self.__name_index[position:]
+
+    def __rebuild_index(self):
+        # Stable sort, ties keep registration order
+        index = tuple(sorted(self.__schemes.values(), key=lambda item: -item.get_priority()))
+        self.__priority_keys = tuple(-scheme.get_priority() for scheme in index)
+        self.__priority_index = index
+        self.__name_index = tuple(sorted(self.__schemes.keys()))
+
+    def __unindex_scheme(self, scheme: "AbstractJoinMOTDScheme"):
+        name = scheme.get_name()
+        position = bisect.bisect_left(self.__name_index, name)
+        if self.__name_index[position:position + 1] == (name,):
+            self.__name_index = self.__name_index[:position] + self.__name_index[position + 1:]
+        for position, item in enumerate(self.__priority_index):
+            if item is scheme:
+                self.__priority_keys = self.__priority_keys[:position] + self.__priority_keys[position + 1:]
+                self.__priority_index = self.__priority_index[:position] + self.__priority_index[position + 1:]
+                return
 
     """def register_all_schemes(self):
         for item in os.listdir(self.dir_path):
@@ -67,41 +175,394 @@ class SchemeManager:
                     self.__inst.logger.exception(f'Import scheme python module "{path}" failed', exc_info=exc)
                     continue"""
 
-    def get_available_schemes(self, player: str, info: Optional[Info] = None) -> Iterable["AbstractJoinMOTDScheme"]:
-        return filter(lambda s: s.is_enabled(player, info), self.__schemes.values())
+    def register_declarative_schemes(self):
+        from advanced_join_motd.declarative import load_declarative_schemes
+        for scheme in load_declarative_schemes(self.__inst, self.dir_path):
+            self.register_scheme_instance(scheme)
+
+    def reload_declarative_schemes(self):
+        from advanced_join_motd.declarative import DeclarativeScheme, load_declarative_schemes
+        old = [scheme for scheme in self.__schemes.values() if isinstance(scheme, DeclarativeScheme)]
+        loaded = load_declarative_schemes(self.__inst, self.dir_path, old)
+        loaded_ids = {id(scheme) for scheme in loaded}
+        # The new set is built aside and swapped in, joins handled meanwhile still see the old one
+        schemes = {name: scheme for name, scheme in self.__schemes.items() if not isinstance(scheme, DeclarativeScheme) or id(scheme) in loaded_ids}
+        breakers = dict(self.__breakers)
+        options = self.__inst.config.scheme_guard
+        for scheme in loaded:
+            name = scheme.get_name()
+            if schemes.get(name) is scheme:
+                continue
+            if name in schemes:
+                self.__inst.logger.error(f"Duplicated name scheme found: {name}")
+                continue
+            schemes[name] = scheme
+            breakers[name] = CircuitBreaker(options.failure_threshold, options.cooldown)
+            self.__inst.logger.info(f'Registered scheme {name}')
+        self.__breakers = breakers
+        self.__schemes = schemes
+        self.__rebuild_index()
+
+        removed = [scheme for scheme in old if id(scheme) not in loaded_ids]
+        for scheme in removed:
+            name = scheme.get_name()
+            if name not in schemes:
+                self.__breakers.pop(name, None)
+                if self.__metrics is not None:
+                    self.__metrics.remove(name)
+            self.__render_cache.invalidate(name)
+        if removed:
+            clear_translation_cache()
+
+    def create_context(self, player: str, info: Optional[Info] = None) -> JoinContext:
+        return JoinContext(self.__inst, player, info)
+
+    def get_available_schemes(self, context: JoinContext) -> Iterator["AbstractJoinMOTDScheme"]:
+        # Lazy, highest priority first, so callers may stop at the first scheme that renders
+        for scheme in self.__priority_index:
+            breaker = self.__breakers.get(scheme.get_name())
+            if breaker is None:
+                continue
+            if not breaker.allow():
+                if self.__metrics is not None:
+                    self.__metrics.count_skipped(scheme.get_name())
+                continue
+            try:
+                enabled = self.__call_scheme(scheme, breaker, scheme.is_enabled, context)
+            except Exception:
+                continue
+            if enabled:
+                yield scheme
+
+    def __call_scheme(self, scheme: "AbstractJoinMOTDScheme", breaker: CircuitBreaker, func, context: JoinContext):
+        name = scheme.get_name()
+        metrics = self.__metrics
+        start = time.perf_counter() if metrics is not None else 0
+        step = None if context.trace is None else context.trace.begin_step(name, func.__name__)
+        try:
+            if step is None:
+                result = call_with_timeout(call_with_context, func, context, timeout=self.__inst.config.scheme_guard.get_timeout(name))
+            else:
+                result = call_with_timeout(step.run, call_with_context, func, context, timeout=self.__inst.config.scheme_guard.get_timeout(name))
+        except Exception as exc:
+            if step is not None:
+                context.trace.end_step(step, exc)
+            if metrics is not None:
+                metrics.observe_call(name, func.__name__, (time.perf_counter() - start) * 1000, exc)
+            tripped = breaker.record_failure(exc, func.__name__)
+            failures = breaker.get_failures(func.__name__)
+            # Only the first failure in a row gets a full traceback
+            if failures == 1:
+                self.__inst.logger.exception(f"Error calling {func.__name__} of scheme {name}", exc_info=exc)
+            else:
+                self.__inst.logger.warning(f"Error calling {func.__name__} of scheme {name} ({failures} times in a row): {breaker.last_error}")
+            if tripped:
+                self.__inst.logger.warning(f"Scheme {name} is skipped for {self.__inst.config.scheme_guard.cooldown}s due to consecutive failures")
+            raise
+        if step is not None:
+            context.trace.end_step(step)
+        if metrics is not None:
+            metrics.observe_call(name, func.__name__, (time.perf_counter() - start) * 1000)
+        breaker.record_success(func.__name__)
+        return result
+
+    def __get_cache_key(self, scheme: "AbstractJoinMOTDScheme", context: JoinContext):
+        try:
+            return call_with_context(scheme.get_cache_key, context)
+        except Exception as exc:
+            self.__inst.logger.debug(f'Failed to get cache key of scheme {scheme.get_name()}, skipped caching: {exc}')
+            return None
+
+    def __render(
+            self, scheme: "AbstractJoinMOTDScheme", breaker: CircuitBreaker, context: JoinContext,
+            rendered: Optional[Dict[Tuple[str, Hashable], MessageText]] = None
+    ) -> Tuple[MessageText, Optional[Hashable]]:
+        """
+        :param rendered: Texts rendered for other joins of the same batch, by (scheme name, cache key)
+        :return: The text and its cache key, None if not cached
+        """
+        cache_key = self.__get_cache_key(scheme, context)
+        if cache_key is None:
+            return self.__call_scheme(scheme, breaker, scheme.get_scheme_text, context), None
+        name = scheme.get_name()
+        text = None if rendered is None else rendered.get((name, cache_key))
+        if text is None:
+            text = self.__render_cache.get(name, cache_key)
+        if text is None:
+            text = self.__call_scheme(scheme, breaker, scheme.get_scheme_text, context)
+            self.__render_cache.put(name, cache_key, text, scheme.get_cache_ttl())
+        elif self.__metrics is not None:
+            self.__metrics.count_cache_hit(name)
+        if rendered is not None:
+            rendered[(name, cache_key)] = text
+        return text, cache_key
 
     # Ra1ny_Yuki[/127.0.0.1:7890] logged in with entity id 1 at (1, 2, 3)
     def on_player_joined(self, server: PluginServerInterface, player: Optional[str] = None, info: Optional[Info] = None):
-        def tell(msg: MessageText):
-            if player is None:
-                return self.__inst.logger.info(msg)
-            return server.tell(player, msg)
+        if player is not None:
+            self.__online_players.add(player)
+            if self.__player_history is not None:
+                self.__player_history.record_join(player)
+            delivery_limiter = self.__delivery_limiter
+            if delivery_limiter is not None and delivery_limiter.is_limited(player):
+                return self.__inst.logger.debug(f'Join message for {player} skipped, delivered too frequently')
+        join_batcher = self.__join_batcher
+        if join_batcher is not None and join_batcher.submit((server, player, info)):
+            return
+        worker_pool = self.__worker_pool
+        if worker_pool is None:
+            return self.generate_and_tell(server, player, info, limit_delivery=True)
+        key = player or ''
+        if worker_pool.submit(key, lambda: self.generate_and_tell(server, player, info, limit_delivery=True)):
+            return
+        options = self.__inst.config.generation
+        self.__inst.logger.debug(f'Generation queue is full, join message for {player} overflowed')
+        # A fallback text would overtake the messages still queued for this player, drop it instead
+        if options.drop_on_overflow or worker_pool.has_pending(key):
+            return
+        # No scheme is asked on MCDR's thread, only the text chosen for the last join of this player is reused
+        text = self.__render_cache.get_chosen(player or 'Console')
+        if text is not None:
+            return self.tell(server, player, '\n' + text)
+        self.tell(server, player, rtr('preview.overflow', plugin_name=self.__inst.server.get_self_metadata().name))
 
-        self.__inst.logger.debug('Generating player join message')
-        schemes = self.get_available_schemes(player, info)
-        for scheme in sorted(schemes, reverse=True):  # type: AbstractJoinMOTDScheme
+    def tell(self, server: PluginServerInterface, player: Optional[str], msg: MessageText):
+        if player is None:
+            return self.__inst.logger.info(msg)
+        return server.tell(player, msg)
+
+    def __generate(
+            self, context: JoinContext, rendered: Optional[Dict[Tuple[str, Hashable], MessageText]] = None,
+            limit_delivery: bool = False
+    ) -> List[MessageText]:
+        recorder = self.__slow_join_recorder
+        if recorder is None:
+            return self.__generate_messages(context, rendered, limit_delivery)
+        context.trace = recorder.begin(context.player)
+        try:
+            return self.__generate_messages(context, rendered, limit_delivery)
+        finally:
+            recorder.finish(context.trace)
+
+    def __generate_messages(
+            self, context: JoinContext, rendered: Optional[Dict[Tuple[str, Hashable], MessageText]],
+            limit_delivery: bool
+    ) -> List[MessageText]:
+        messages = []
+        metrics = self.__metrics
+        start = time.perf_counter() if metrics is not None else 0
+        delivery_limiter = self.__delivery_limiter if limit_delivery else None
+        for scheme in self.get_available_schemes(context):  # type: AbstractJoinMOTDScheme
+            breaker = self.__breakers.get(scheme.get_name())
+            if breaker is None:
+                continue
+            # Checked before rendering, a skipped delivery costs nothing more
+            if delivery_limiter is not None and not delivery_limiter.can_deliver(context.player, scheme.get_name()):
+                self.__inst.logger.debug(f'Join message for {context.player} skipped, scheme {scheme.get_name()} delivered recently')
+                break
             try:
-                return tell('\n' + scheme.get_scheme_text(player or 'Console', info))
+                text, cache_key = self.__render(scheme, breaker, context, rendered)
             except Exception as exc:
-                tell(
+                messages.append(
                     (rtr(
                         'preview.generated_failed',
                         scheme_name=scheme.get_name()
                     ) + str(exc)).set_color(RColor.red)
                 )
-                self.__inst.logger.exception(f"Error generate MOTD text with scheme {scheme.get_name()}", exc_info=exc)
+                continue
+            # The token is only taken for a text actually delivered
+            if delivery_limiter is not None and not delivery_limiter.try_deliver(context.player, scheme.get_name()):
+                self.__inst.logger.debug(f'Join message for {context.player} skipped, delivered too frequently')
+                break
+            self.__render_cache.set_chosen(context.player, scheme.get_name(), cache_key)
+            if metrics is not None:
+                metrics.count_won(scheme.get_name())
+            messages.append('\n' + text)
+            break
+        else:
+            messages.append(rtr('preview.no_avail', plugin_name=self.__inst.server.get_self_metadata().name))
+        if metrics is not None:
+            metrics.observe_join((time.perf_counter() - start) * 1000)
+        return messages
+
+    def generate_and_tell(self, server: PluginServerInterface, player: Optional[str] = None, info: Optional[Info] = None, limit_delivery: bool = False):
+        """
+        :param limit_delivery: Apply the per player delivery limit, for join messages rather than previews
+        """
+        self.__inst.logger.debug('Generating player join message')
+        for msg in self.__generate(self.create_context(player or 'Console', info), limit_delivery=limit_delivery):
+            self.tell(server, player, msg)
+
+    def __generate_batch(self, joins: List[Tuple[PluginServerInterface, Optional[str], Optional[Info]]]):
+        rendered: Dict[Tuple[str, Hashable], MessageText] = {}
+        deliveries = []
+        for server, player, info in joins:
+            try:
+                deliveries.append((server, player, self.__generate(self.create_context(player or 'Console', info), rendered, limit_delivery=True)))
+            except Exception as exc:
+                self.__inst.logger.exception(f'Error generating join message for {player}', exc_info=exc)
+        # Delivered after the whole batch is rendered
+        for server, player, messages in deliveries:
+            for msg in messages:
+                self.tell(server, player, msg)
+        self.__inst.logger.debug(f'Delivered join messages of {len(joins)} players in a batch, {len(rendered)} cached texts used')
+
+    def __seed_online_players(self, server: PluginServerInterface):
+        if not server.is_server_startup() or not server.is_rcon_running():
+            return
+        try:
+            result = server.rcon_query('list')
+        except Exception as exc:
+            return self.__inst.logger.debug(f'Failed to query online players: {exc}')
+        match = None if result is None else self.__PLAYER_LIST_PATTERN.search(result)
+        if match is None:
+            return
+        players = [name.strip() for name in re.split(r'[,\n]', match.group(1)) if name.strip()]
+        self.__online_players.update(players)
+        self.__inst.logger.debug(f'Found {len(players)} online players through RCON')
+
+    def on_player_left(self, server: PluginServerInterface, player: str):
+        self.__online_players.discard(player)
 
-        tell(rtr('preview.no_avail', plugin_name=self.__inst.server.get_self_metadata().name))
+    def on_server_stop(self, server: PluginServerInterface, *args):
+        self.__online_players.clear()
 
     def on_unload(self, server: PluginServerInterface):
-        for name, module in self.__modules.keys():
+        if self.__worker_pool is not None:
+            self.__worker_pool.stop()
+            self.__worker_pool = None
+        if self.__join_batcher is not None:
+            self.__join_batcher.stop()
+            self.__join_batcher = None
+        if self.__metrics_dumper is not None:
+            self.__metrics_dumper.stop()
+            self.__metrics_dumper = None
+        if self.__slow_join_recorder is not None:
+            self.__slow_join_recorder.stop()
+            self.__slow_join_recorder = None
+        if self.__player_history is not None:
+            self.__player_history.stop()
+            self.__player_history = None
+        for name, module in self.__modules.items():
             del sys.modules[name]
 
     def on_refresh(self):
-        for scheme in self.__schemes.values():
+        self.reload_declarative_schemes()
+        for scheme in list(self.__schemes.values()):
             scheme.on_refresh()
 
+    def on_config_changed(self, changed_keys: List[str]):
+        config = self.__inst.config
+        if 'generation' in changed_keys:
+            old_pool = self.__worker_pool
+            self.__start_worker_pool()
+            if old_pool is not None:
+                # Joins already queued are still delivered by the old workers
+                old_pool.stop(drain=True)
+        if 'join_batching' in changed_keys:
+            old_batcher = self.__join_batcher
+            self.__start_join_batcher()
+            if old_batcher is not None:
+                old_batcher.stop(drain=True)
+        if 'scheme_guard' in changed_keys:
+            options = config.scheme_guard
+            self.__breakers = {name: CircuitBreaker(options.failure_threshold, options.cooldown) for name in self.__schemes.keys()}
+        if 'render_cache_size' in changed_keys:
+            self.__render_cache.resize(config.render_cache_size)
+        if 'delivery_limit' in changed_keys:
+            self.__start_delivery_limiter()
+        if 'metrics' in changed_keys:
+            self.__start_metrics()
+        if 'slow_join' in changed_keys:
+            self.__start_slow_join_recorder()
+        if 'player_history' in changed_keys:
+            self.__start_player_history()
+
+    @property
+    def player_history(self) -> Optional[PlayerHistory]:
+        return self.__player_history
+
+    def __start_player_history(self):
+        if self.__player_history is not None:
+            self.__player_history.stop()
+            self.__player_history = None
+        options = self.__inst.config.player_history
+        if not options.enabled:
+            return
+        player_history = PlayerHistory(self.__inst, options.flush_interval, options.compact_ratio)
+        player_history.load()
+        player_history.start()
+        self.__player_history = player_history
+
+    def __start_slow_join_recorder(self):
+        if self.__slow_join_recorder is not None:
+            self.__slow_join_recorder.stop()
+            self.__slow_join_recorder = None
+        options = self.__inst.config.slow_join
+        if not options.enabled:
+            return
+        recorder = SlowJoinRecorder(self.__inst, options.threshold, options.sample_interval, options.max_records, options.max_total_size)
+        recorder.start()
+        self.__slow_join_recorder = recorder
+
+    @property
+    def metrics(self) -> Optional[MetricsRegistry]:
+        return self.__metrics
+
+    def __start_metrics(self):
+        options = self.__inst.config.metrics
+        if self.__metrics_dumper is not None:
+            self.__metrics_dumper.stop()
+            self.__metrics_dumper = None
+        if not options.enabled:
+            self.__metrics = None
+            return
+        # Recorded metrics are kept when only dumping options changed
+        if self.__metrics is None:
+            self.__metrics = MetricsRegistry()
+        if options.dump_interval > 0:
+            self.__metrics_dumper = MetricsDumper(self.__inst, self.__metrics, options.dump_interval, options.dump_format)
+            self.__metrics_dumper.start()
+
+    def __start_delivery_limiter(self):
+        options = self.__inst.config.delivery_limit
+        if not options.enabled:
+            self.__delivery_limiter = None
+            return
+        self.__delivery_limiter = DeliveryLimiter(options.burst, options.refill_interval, options.same_scheme_interval, options.max_records)
+
+    def __start_join_batcher(self):
+        options = self.__inst.config.join_batching
+        if not options.enabled:
+            self.__join_batcher = None
+            return
+        join_batcher = Batcher('JoinBatcher', options.window, options.max_batch_size, self.__generate_batch)
+        join_batcher.start()
+        self.__join_batcher = join_batcher
+
+    def __start_worker_pool(self):
+        options = self.__inst.config.generation
+        if not options.is_async:
+            self.__worker_pool = None
+            return
+        worker_pool = OrderedWorkerPool('MOTDWorker', options.worker_count, options.max_queue_size)
+        worker_pool.start()
+        self.__worker_pool = worker_pool
+        self.__inst.logger.debug(f'Started {options.worker_count} MOTD generation workers')
+
     def on_load(self, server: PluginServerInterface):
         # self.register_all_schemes()
+        self.register_declarative_schemes()
+        self.__start_worker_pool()
+        self.__start_join_batcher()
+        self.__start_delivery_limiter()
+        self.__start_metrics()
+        self.__start_slow_join_recorder()
+        self.__start_player_history()
+        # Non-empty after a reload of this plugin
+        self.__seed_online_players(server)
         self.__inst.logger.debug('Registering on_player_join event')
         server.register_event_listener(MCDRPluginEvents.PLAYER_JOINED, self.on_player_joined)
+        server.register_event_listener(MCDRPluginEvents.PLAYER_LEFT, self.on_player_left)
+        server.register_event_listener(MCDRPluginEvents.SERVER_STOP, self.on_server_stop)
+        server.register_event_listener(MCDRPluginEvents.PLUGIN_UNLOADED, self.on_unload)
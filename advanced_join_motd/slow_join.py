@@ -0,0 +1,192 @@
+import json
+import os
+import re
+import sys
+import threading
+import time
+import traceback
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Set, Tuple
+
+from advanced_join_motd.utils import file_util
+from advanced_join_motd.utils.misc import named_thread
+
+if TYPE_CHECKING:
+    from advanced_join_motd.advanced_join_motd import AdvancedJoinMOTD
+
+
+_STACK_LIMIT = 40
+_TOP_STACKS = 5
+
+
+class TraceStep:
+    __slots__ = ('scheme', 'method', 'started_at', 'elapsed', 'error', 'thread_id', 'samples')
+
+    def __init__(self, scheme: str, method: str):
+        self.scheme = scheme
+        self.method = method
+        self.started_at = time.perf_counter()
+        self.elapsed: Optional[float] = None
+        self.error: Optional[str] = None
+        # Set by the thread running the call, which differs from the join thread under the timeout guard
+        self.thread_id: Optional[int] = None
+        self.samples: Dict[Tuple[str, ...], int] = {}
+
+    def run(self, func: Callable, *args):
+        self.thread_id = threading.get_ident()
+        return func(*args)
+
+    def to_dict(self) -> dict:
+        stacks = sorted(self.samples.items(), key=lambda item: item[1], reverse=True)[:_TOP_STACKS]
+        return {
+            'scheme': self.scheme,
+            'method': self.method,
+            'ms': None if self.elapsed is None else round(self.elapsed * 1000, 3),
+            'error': self.error,
+            'samples': [{'count': count, 'stack': list(stack)} for stack, count in stacks]
+        }
+
+
+class JoinTrace:
+    """
+    Scheme calls made for one join, in calling order
+    """
+    __slots__ = ('player', 'started_at', 'steps', 'current')
+
+    def __init__(self, player: str):
+        self.player = player
+        self.started_at = time.perf_counter()
+        self.steps: List[TraceStep] = []
+        self.current: Optional[TraceStep] = None
+
+    def begin_step(self, scheme: str, method: str) -> TraceStep:
+        step = self.current = TraceStep(scheme, method)
+        self.steps.append(step)
+        return step
+
+    def end_step(self, step: TraceStep, error: Optional[BaseException] = None):
+        step.elapsed = time.perf_counter() - step.started_at
+        if error is not None:
+            step.error = f'{type(error).__name__}: {error}'
+        self.current = None
+
+
+class SlowJoinRecorder:
+    """
+    Records joins slower than threshold milliseconds into the slow_joins folder of the data folder
+    A single watchdog thread samples stacks of scheme calls running longer than sample_interval milliseconds
+    and writes records of finished slow joins, it sleeps while there's nothing to do
+    Oldest records are removed when there are more than max_records of them, or they take more than max_total_size KiB
+    """
+    FOLDER = 'slow_joins'
+    __UNSAFE_CHARS = re.compile(r'[^A-Za-z0-9_.-]')
+
+    def __init__(self, plugin_inst: "AdvancedJoinMOTD", threshold: float, sample_interval: float, max_records: int, max_total_size: int):
+        self.__inst = plugin_inst
+        self.__threshold = threshold / 1000
+        self.__sample_interval = max(sample_interval, 1) / 1000
+        self.__max_records = max(max_records, 1)
+        self.__max_total_size = max_total_size * 1024
+        self.__active: Set[JoinTrace] = set()
+        # Slow joins waiting to be written by the watchdog thread, with elapsed seconds and finishing time in ns
+        self.__finished: List[Tuple[JoinTrace, float, int]] = []
+        self.__lock = threading.Lock()
+        self.__wake_event = threading.Event()
+        self.__stop_event = threading.Event()
+
+    @property
+    def folder(self) -> str:
+        return os.path.join(self.__inst.get_data_folder(), self.FOLDER)
+
+    def begin(self, player: str) -> JoinTrace:
+        trace = JoinTrace(player)
+        with self.__lock:
+            self.__active.add(trace)
+        self.__wake_event.set()
+        return trace
+
+    def finish(self, trace: JoinTrace):
+        elapsed = time.perf_counter() - trace.started_at
+        with self.__lock:
+            self.__active.discard(trace)
+            if elapsed < self.__threshold:
+                return
+            self.__finished.append((trace, elapsed, time.time_ns()))
+        self.__wake_event.set()
+
+    def __write_finished(self):
+        with self.__lock:
+            finished, self.__finished = self.__finished, []
+        if not finished:
+            return
+        try:
+            folder = file_util.ensure_dir(self.folder)
+            for trace, elapsed, finished_at in finished:
+                self.__write_record(folder, trace, elapsed, finished_at)
+            self.__rotate(folder)
+        except Exception as exc:
+            self.__inst.logger.warning(f'Failed to write slow join record: {exc}')
+
+    def __write_record(self, folder: str, trace: JoinTrace, elapsed: float, finished_at: int):
+        local_time = time.localtime(finished_at // 1000000000)
+        file_name = f'{time.strftime("%Y%m%d-%H%M%S", local_time)}-{finished_at % 1000000000:09d}-{self.__UNSAFE_CHARS.sub("_", trace.player)}.json'
+        record = {
+            'time': time.strftime('%Y-%m-%d %H:%M:%S', local_time),
+            'player': trace.player,
+            'ms': round(elapsed * 1000, 3),
+            'threshold_ms': self.__threshold * 1000,
+            'steps': [step.to_dict() for step in trace.steps]
+        }
+        with file_util.safe_write(os.path.join(folder, file_name)) as f:
+            json.dump(record, f, indent=2, ensure_ascii=False)
+        self.__inst.logger.warning(f'Join message for {trace.player} took {elapsed * 1000:.1f}ms, recorded as {self.FOLDER}/{file_name}')
+
+    def __rotate(self, folder: str):
+        files = sorted(file for file in os.listdir(folder) if file.endswith('.json'))
+        sizes = [os.path.getsize(os.path.join(folder, file)) for file in files]
+        total_size = sum(sizes)
+        # Names start with the time, so the oldest come first
+        while len(files) > 1 and (len(files) > self.__max_records or total_size > self.__max_total_size):
+            file_util.delete(os.path.join(folder, files.pop(0)))
+            total_size -= sizes.pop(0)
+
+    def start(self):
+        named_thread('SlowJoinWatchdog')(self.__run)()
+
+    def stop(self):
+        """
+        Stop the watchdog thread, then write records still waiting in the calling thread
+        """
+        self.__stop_event.set()
+        self.__wake_event.set()
+        self.__write_finished()
+
+    def __sample(self):
+        frames = sys._current_frames()
+        now = time.perf_counter()
+        with self.__lock:
+            traces = list(self.__active)
+        for trace in traces:
+            step = trace.current
+            if step is None or step.thread_id is None or now - step.started_at < self.__sample_interval:
+                continue
+            frame = frames.get(step.thread_id)
+            if frame is None:
+                continue
+            stack = tuple(f'{item.filename}:{item.lineno} {item.name}' for item in traceback.extract_stack(frame, limit=_STACK_LIMIT))
+            step.samples[stack] = step.samples.get(stack, 0) + 1
+
+    def __run(self):
+        while not self.__stop_event.is_set():
+            with self.__lock:
+                idle = not self.__active and not self.__finished
+                if idle:
+                    self.__wake_event.clear()
+            if idle:
+                self.__wake_event.wait()
+                continue
+            self.__write_finished()
+            if not self.__active:
+                continue
+            if self.__stop_event.wait(self.__sample_interval):
+                break
+            self.__sample()
@@ -0,0 +1,88 @@
+import string
+from typing import Any, Callable, Dict, FrozenSet, List, NamedTuple, Optional, Tuple, Union
+
+from mcdreforged.api.rtext import RText
+
+from advanced_join_motd.join_context import JoinContext
+
+
+PlaceholderProvider = Callable[[JoinContext], Any]
+
+
+def _server_version(context: JoinContext):
+    information = context.plugin_inst.server.get_server_information()
+    return information.version or ''
+
+
+_PLACEHOLDERS: Dict[str, PlaceholderProvider] = {
+    'player': lambda context: context.player,
+    'online': lambda context: context.online_count,
+    'join_count': lambda context: 0 if context.history is None else context.history.join_count,
+    'now': lambda context: context.now,
+    'time': lambda context: context.now.strftime('%H:%M:%S'),
+    'date': lambda context: context.now.date().isoformat(),
+    'plugin_version': lambda context: str(context.plugin_inst.server.get_self_metadata().version),
+    'mcdr_version': lambda context: str(context.plugin_inst.server.get_plugin_metadata('mcdreforged').version),
+    'server_version': _server_version,
+}
+
+
+def register_placeholder(name: str, provider: PlaceholderProvider):
+    """
+    Make {name} available in templates, provider is only called for templates using it
+    """
+    _PLACEHOLDERS[name] = provider
+
+
+class _Field(NamedTuple):
+    name: str
+    format_spec: str
+    conversion: Optional[str]
+    source: str
+
+
+class MOTDTemplate:
+    """
+    Text with {placeholder} fields and § style codes, parsed once and rendered into RText with one pass of substitution
+    Placeholders use str.format syntax, e.g. {now:%H:%M}, literal braces are written as {{ and }}
+    """
+    __formatter = string.Formatter()
+
+    def __init__(self, source: str):
+        self.source = source
+        segments: List[Union[str, _Field]] = []
+        for literal, field_name, format_spec, conversion in self.__formatter.parse(source):
+            if literal:
+                segments.append(literal)
+            if field_name is not None:
+                field_source = '{' + field_name + ('!' + conversion if conversion else '') + (':' + format_spec if format_spec else '') + '}'
+                segments.append(_Field(field_name, format_spec or '', conversion, field_source))
+        self.__segments: Tuple[Union[str, _Field], ...] = tuple(segments)
+        self.placeholders: FrozenSet[str] = frozenset(item.name for item in segments if isinstance(item, _Field))
+
+    @property
+    def unknown_placeholders(self) -> List[str]:
+        return [name for name in self.placeholders if name not in _PLACEHOLDERS]
+
+    def get_values(self, context: JoinContext) -> Dict[str, Any]:
+        return {name: _PLACEHOLDERS[name](context) for name in self.placeholders if name in _PLACEHOLDERS}
+
+    def render(self, context: JoinContext, values: Optional[Dict[str, Any]] = None) -> RText:
+        if values is None:
+            values = self.get_values(context)
+        parts = []
+        for item in self.__segments:
+            if not isinstance(item, _Field):
+                parts.append(item)
+                continue
+            if item.name not in values:
+                # Unknown placeholders are kept as they are
+                parts.append(item.source)
+                continue
+            value = values[item.name]
+            if item.conversion == 'r':
+                value = repr(value)
+            elif item.conversion == 's':
+                value = str(value)
+            parts.append(format(value, item.format_spec))
+        return RText(''.join(parts))
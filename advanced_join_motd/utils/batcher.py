@@ -0,0 +1,80 @@
+import threading
+import time
+from typing import Callable, Generic, List, Optional, TypeVar
+
+from advanced_join_motd.utils.misc import named_thread, psi
+
+T = TypeVar('T')
+
+
+class Batcher(Generic[T]):
+    """
+    Collects items submitted from any thread and hands them to the handler in batches, in one named thread
+    A batch is handled window seconds after its first item arrived, or as soon as it reaches max_size items
+    """
+    def __init__(self, name: str, window: float, max_size: int, handler: Callable[[List[T]], None]):
+        self.__name = name
+        self.__window = max(window, 0)
+        self.__max_size = max(max_size, 1)
+        self.__handler = handler
+        self.__condition = threading.Condition()
+        self.__items: List[T] = []
+        self.__first_at: Optional[float] = None
+        self.__running = False
+
+    def start(self):
+        with self.__condition:
+            if self.__running:
+                return
+            self.__running = True
+        named_thread(self.__name)(self.__run)()
+
+    def stop(self, drain: bool = False):
+        """
+        :param drain: Handle items already submitted before exiting, or discard them
+        """
+        with self.__condition:
+            self.__running = False
+            if not drain:
+                self.__items.clear()
+            self.__condition.notify_all()
+
+    def submit(self, item: T) -> bool:
+        """
+        :return: False if the batcher is not running
+        """
+        with self.__condition:
+            if not self.__running:
+                return False
+            self.__items.append(item)
+            if len(self.__items) == 1:
+                self.__first_at = time.monotonic()
+                self.__condition.notify_all()
+            elif len(self.__items) >= self.__max_size:
+                self.__condition.notify_all()
+        return True
+
+    def __next_batch(self) -> List[T]:
+        with self.__condition:
+            while not self.__items and self.__running:
+                self.__condition.wait()
+            while self.__running and len(self.__items) < self.__max_size:
+                remaining = self.__first_at + self.__window - time.monotonic()
+                if remaining <= 0:
+                    break
+                self.__condition.wait(remaining)
+            batch = self.__items[:self.__max_size]
+            del self.__items[:self.__max_size]
+            # Items left over start the next window now
+            self.__first_at = time.monotonic() if self.__items else None
+            return batch
+
+    def __run(self):
+        while True:
+            batch = self.__next_batch()
+            if not batch:
+                return
+            try:
+                self.__handler(batch)
+            except Exception as exc:
+                psi.logger.exception(f'Error handling a batch of {len(batch)} items in {threading.current_thread().name}', exc_info=exc)
@@ -1,12 +1,16 @@
 import logging
 import os
+import queue
 import re
+import threading
+from logging.handlers import QueueHandler
 from typing import Optional, TYPE_CHECKING
 
 from mcdreforged.api.event import MCDRPluginEvents
 from mcdreforged.api.types import MCDReforgedLogger
 
 from advanced_join_motd.utils.file_util import ensure_dir
+from advanced_join_motd.utils.misc import get_thread_prefix
 
 if TYPE_CHECKING:
     from advanced_join_motd.advanced_join_motd import AdvancedJoinMOTD
@@ -14,16 +18,48 @@ if TYPE_CHECKING:
 
 class BlossomLogger(MCDReforgedLogger):
     class NoColorFormatter(logging.Formatter):
+        CONSOLE_COLOR_CODE = re.compile(r'\033\[(\d+(;\d+)?)?m')
+        MINECRAFT_COLOR_CODE = re.compile(r'§[a-z0-9]')
+        ANY_COLOR_CODE = re.compile(r'\033\[(\d+(;\d+)?)?m|§[a-z0-9]')
+
         def formatMessage(self, record) -> str:
-            return self.clean_console_color_code(self.clean_minecraft_color_code(super().formatMessage(record)))
+            return self.ANY_COLOR_CODE.sub('', super().formatMessage(record))
+
+        @classmethod
+        def clean_console_color_code(cls, text: str) -> str:
+            return cls.CONSOLE_COLOR_CODE.sub('', text)
+
+        @classmethod
+        def clean_minecraft_color_code(cls, text: str):
+            return cls.MINECRAFT_COLOR_CODE.sub('', str(text))
+
+    class QueueWriter:
+        """
+        Hands records put into the queue by a QueueHandler to the file handler in its own thread
+        """
+        __STOP = object()
 
-        @staticmethod
-        def clean_console_color_code(text: str) -> str:
-            return re.compile(r'\033\[(\d+(;\d+)?)?m').sub('', text)
+        def __init__(self, record_queue: queue.SimpleQueue, handler: logging.Handler):
+            self.__queue = record_queue
+            self.__handler = handler
+            self.__thread = threading.Thread(target=self.__run, name=get_thread_prefix() + 'LogWriter', daemon=True)
 
-        @staticmethod
-        def clean_minecraft_color_code(text: str):
-            return re.compile(r'§[a-z0-9]').sub('', str(text))
+        def start(self):
+            self.__thread.start()
+
+        def stop(self):
+            """
+            Wait until records still queued are written
+            """
+            self.__queue.put(self.__STOP)
+            self.__thread.join()
+
+        def __run(self):
+            while True:
+                record = self.__queue.get()
+                if record is self.__STOP:
+                    break
+                self.__handler.handle(record)
 
     __SINGLE_FILE_LOG_PATH: Optional[str] = "alocasia.log"
     FILE_FMT: NoColorFormatter = NoColorFormatter(
@@ -35,6 +71,8 @@ class BlossomLogger(MCDReforgedLogger):
         self.__inst = plugin_inst
         psi = self.__inst.server
         self._blossom_file_handler = None
+        self._blossom_queue_handler = None
+        self._blossom_queue_writer = None
         if psi is not None:
             super().__init__(psi.get_self_metadata().id)
         else:
@@ -44,12 +82,21 @@ class BlossomLogger(MCDReforgedLogger):
         return super().debug(*args, option=option, no_check=no_check or self.__inst.verbosity)
 
     def _blossom_unbind_file(self, *args, **kwargs) -> None:
+        if self._blossom_queue_handler is not None:
+            self.removeHandler(self._blossom_queue_handler)
+            # Writes out what is still queued
+            self._blossom_queue_writer.stop()
+            self._blossom_queue_handler = None
+            self._blossom_queue_writer = None
         if self._blossom_file_handler is not None:
             self.removeHandler(self._blossom_file_handler)
             self._blossom_file_handler.close()
             self._blossom_file_handler = None
 
-    def blossom_bind_single_file(self, file_name: Optional[str] = None) -> "BlossomLogger":
+    def blossom_bind_single_file(self, file_name: Optional[str] = None, queued: bool = False) -> "BlossomLogger":
+        """
+        :param queued: Write the file in a background thread, logging calls only put records into a queue
+        """
         if file_name is None:
             if self.__SINGLE_FILE_LOG_PATH is None:
                 return self
@@ -58,8 +105,16 @@ class BlossomLogger(MCDReforgedLogger):
         ensure_dir(os.path.dirname(file_name))
         self._blossom_file_handler = logging.FileHandler(file_name, encoding='UTF-8')
         self._blossom_file_handler.setFormatter(self.FILE_FMT)
-        self.addHandler(self._blossom_file_handler)
+        if queued:
+            record_queue = queue.SimpleQueue()
+            self._blossom_queue_handler = QueueHandler(record_queue)
+            self._blossom_queue_writer = self.QueueWriter(record_queue, self._blossom_file_handler)
+            self._blossom_queue_writer.start()
+            self.addHandler(self._blossom_queue_handler)
+        else:
+            self.addHandler(self._blossom_file_handler)
         return self
 
     def register_event_listeners(self):
-        self.__inst.server.register_event_listener(MCDRPluginEvents.PLUGIN_LOADED, self._blossom_unbind_file)
+        # Flushes queued records and closes the file before a reload, or the writer thread and file would leak
+        self.__inst.server.register_event_listener(MCDRPluginEvents.PLUGIN_UNLOADED, self._blossom_unbind_file)
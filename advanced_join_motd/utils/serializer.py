@@ -1,6 +1,8 @@
+import copy
+import hashlib
 import os
 import shutil
-from typing import List, Optional, Tuple, get_origin, Type, TYPE_CHECKING
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union, get_args, get_origin, Type, TYPE_CHECKING
 
 from mcdreforged.api.types import CommandSource
 from mcdreforged.api.utils import Serializable, deserialize
@@ -14,51 +16,109 @@ if TYPE_CHECKING:
     from advanced_join_motd.advanced_join_motd import AdvancedJoinMOTD
 
 
+_BASIC_TYPES = (type(None), bool, int, str, list, dict)
+
+
+def _compile_checker(target_type) -> Optional[Callable[[Any], bool]]:
+    """
+    Build a check accepting exactly the data deserialize() accepts for target_type without converting it
+    :return: None if the type is not covered, deserialize() decides for these
+    """
+    if target_type is Any:
+        return lambda value: True
+    if target_type is float:
+        return lambda value: isinstance(value, (float, int))
+    if target_type in _BASIC_TYPES:
+        return lambda value: type(value) is target_type
+    origin, args = get_origin(target_type), get_args(target_type)
+    if origin is Union:
+        checkers = [_compile_checker(item) for item in args]
+        if None in checkers:
+            return None
+        return lambda value: any(checker(value) for checker in checkers)
+    if origin is list and len(args) == 1:
+        element_checker = _compile_checker(args[0])
+        if element_checker is None:
+            return None
+        return lambda value: isinstance(value, list) and all(element_checker(item) for item in value)
+    if origin is dict and len(args) == 2:
+        key_checker, value_checker = _compile_checker(args[0]), _compile_checker(args[1])
+        if key_checker is None or value_checker is None:
+            return None
+        return lambda value: isinstance(value, dict) and all(key_checker(k) and value_checker(v) for k, v in value.items())
+    return None
+
+
+class _FieldPlan:
+    __slots__ = ('key', 'target_type', 'has_default', 'default', 'nested', 'checker', 'converter')
+
+    def __init__(self, key: str, target_type, default_data: dict):
+        self.key = key
+        self.target_type = target_type
+        self.has_default = key in default_data
+        self.default = default_data.get(key)
+        self.nested: Optional[Type[BlossomSerializable]] = None
+        if get_origin(target_type) is None and isinstance(target_type, type) and issubclass(target_type, BlossomSerializable):
+            self.nested = target_type
+        self.checker = _compile_checker(target_type)
+        # Last attempt before falling back to the default, e.g. "5" for int
+        self.converter = target_type if isinstance(target_type, type) else None
+
+    def get_default(self):
+        return copy.deepcopy(self.default)
+
+
 class BlossomSerializable(Serializable):
+    # class -> fields with their checkers and serialized defaults, compiled on first fix
+    __fix_plans: Dict[type, Tuple[_FieldPlan, ...]] = {}
+
+    @classmethod
+    def _get_fix_plan(cls) -> Tuple[_FieldPlan, ...]:
+        plan = BlossomSerializable.__fix_plans.get(cls)
+        if plan is None:
+            default_data = cls.get_default().serialize()
+            plan = BlossomSerializable.__fix_plans[cls] = tuple(
+                _FieldPlan(key, target_type, default_data) for key, target_type in cls.get_field_annotations().items()
+            )
+        return plan
+
     @classmethod
     def _fix_data(cls, data: dict, *, father_nodes: Optional[List[str]] = None) -> Tuple[dict, List[str]]:
         needs_save = list()
-        annotations = cls.get_field_annotations()
-        default_data = cls.get_default().serialize()
-        if father_nodes is None:
-            father_nodes = []
-        fixed_dict = {}
+        fixed_dict = cls.__fix_into(data, '.'.join(father_nodes) + '.' if father_nodes else '', needs_save)
+        return fixed_dict, needs_save
 
-        for key, target_type in annotations.items():
-            current_nodes = father_nodes.copy()
-            current_nodes.append(key)
-            node_name = '.'.join(current_nodes)
-            if key not in data.keys():
-                if key in default_data.keys():
-                    needs_save.append(node_name)
-                    fixed_dict[key] = default_data[key]
+    @classmethod
+    def __fix_into(cls, data: dict, prefix: str, needs_save: List[str]) -> dict:
+        fixed_dict = {}
+        for field in cls._get_fix_plan():
+            key = field.key
+            if key not in data:
+                if field.has_default:
+                    needs_save.append(prefix + key)
+                    fixed_dict[key] = field.get_default()
                 continue
             value = data[key]
 
-            def fix_blossom(single_type: Type[BlossomSerializable], single_data: dict):
-                nonlocal needs_save
-                single_data, save_nodes = single_type._fix_data(single_data, father_nodes=current_nodes)
-                needs_save += save_nodes
-                return single_data
-
-            if get_origin(target_type) is None and issubclass(target_type, BlossomSerializable):
-                value = fix_blossom(target_type, value)
-            else:
+            if field.nested is not None:
+                if not isinstance(value, dict):
+                    # e.g. a section left blank, every key of it is filled with defaults
+                    needs_save.append(prefix + key)
+                    value = {}
+                value = field.nested.__fix_into(value, prefix + key + '.', needs_save)
+            elif field.checker is None or not field.checker(value):
                 try:
-                    value = deserialize(value, target_type, error_at_redundancy=True)
+                    value = deserialize(value, field.target_type, error_at_redundancy=True)
                 except (ValueError, TypeError):
-                    needs_save.append(node_name)
-                    if key not in default_data.keys():
+                    needs_save.append(prefix + key)
+                    if not field.has_default:
                         continue
-                    if isinstance(target_type, Serializable):
-                        value = target_type.get_default().serialize()
-                    else:
-                        try:
-                            value = target_type(value)
-                        except:
-                            value = default_data[key]
+                    try:
+                        value = field.converter(value)
+                    except:
+                        value = field.get_default()
             fixed_dict[key] = value
-        return fixed_dict, needs_save
+        return fixed_dict
 
 
 class ConfigurationBase(BlossomSerializable):
@@ -67,12 +127,15 @@ class ConfigurationBase(BlossomSerializable):
     for item in (__rt_yaml, __safe_yaml):  # type: yaml.YAML
         item.width = 1048576
         item.indent(2, 2, 2)
+    # (class, file path) -> (content hash, validated configuration), kept across reloads of the config
+    __load_cache: Dict[Tuple[type, str], Tuple[str, "ConfigurationBase"]] = {}
 
     def __init__(self, **kwargs):
         self.__file_path = None
         self.__bundled_template_path = None
         self.__reloader: Optional[CommandSource] = None
         self.__plugin_inst = None
+        self.__view = None
         super().__init__(**kwargs)
 
     def set_reloader(self, source: Optional[CommandSource] = None):
@@ -88,6 +151,32 @@ class ConfigurationBase(BlossomSerializable):
     def reloader(self):
         return self.__reloader
 
+    @property
+    def file_path(self) -> Optional[str]:
+        return self.__file_path
+
+    @property
+    def view(self):
+        """
+        Values derived from this configuration, built once when loaded instead of on every read
+        """
+        if self.__view is None:
+            self.rebuild_view()
+        return self.__view
+
+    def rebuild_view(self):
+        self.__view = self._build_view()
+
+    def _build_view(self):
+        return None
+
+    def diff(self, other: "ConfigurationBase") -> List[str]:
+        """
+        :return: Top level keys whose values are different in the other configuration
+        """
+        current, other = self.serialize(), other.serialize()
+        return [key for key in dict.fromkeys(list(current.keys()) + list(other.keys())) if current.get(key) != other.get(key)]
+
     def get_template(self) -> yaml.CommentedMap:
         try:
             with psi.open_bundled_file(self.__bundled_template_path) as f:
@@ -123,11 +212,26 @@ class ConfigurationBase(BlossomSerializable):
                 source_to_reply.reply(text)
 
 
-        default_config = cls.get_default().serialize()
+        def finish_loading(config: "ConfigurationBase"):
+            config.set_config_attr(file_path, plugin_inst, bundled_template_path=bundled_template_path)
+            config.rebuild_view()
+            if needs_save:
+                # Saving config
+                config.save(encoding=encoding, print_to_console=print_to_console, source_to_reply=source_to_reply)
+            config.after_load(plugin_inst)
+            log('server_interface.load_config_simple', _lb_rtr_prefix='', _lb_tr_default_fallback='Config loaded')
+            return config
+
         needs_save = False
         if in_data_folder:
             file_path = os.path.join(plugin_inst.get_data_folder(), file_path)
 
+        # Unchanged file, skip parsing, fixing and validating
+        cache_key = (cls, os.path.abspath(file_path))
+        cached = cls.__load_cache.get(cache_key)
+        if cached is not None and cached[0] == cls.__hash_file(file_path):
+            return finish_loading(copy.deepcopy(cached[1]))
+
         # Load & Fix data
         try:
             string = file_util.lf_read(file_path, encoding=encoding)
@@ -135,7 +239,7 @@ class ConfigurationBase(BlossomSerializable):
         except:
             # Reading failed, remove current file
             file_util.delete(file_path)
-            result_config = default_config.copy()
+            result_config = cls.get_default().serialize()
             needs_save = True
             log("Fail to read config file, using default config")
         else:
@@ -154,15 +258,23 @@ class ConfigurationBase(BlossomSerializable):
             needs_save = True
             log("Fail to read config file, using default config")
 
-        result_config.set_config_attr(file_path, plugin_inst, bundled_template_path=bundled_template_path)
-        if needs_save:
-            # Saving config
-            result_config.save(encoding=encoding, print_to_console=print_to_console, source_to_reply=source_to_reply)
-
-        result_config.after_load(plugin_inst)
-        log('server_interface.load_config_simple', _lb_rtr_prefix='', _lb_tr_default_fallback='Config loaded')
+        # Copied before being bound to the plugin instance
+        snapshot = copy.deepcopy(result_config)
+        result_config = finish_loading(result_config)
+        # Hashed after saving, so the fixed file is what the next load compares with
+        digest = cls.__hash_file(file_path)
+        if digest is not None:
+            cls.__load_cache[cache_key] = (digest, snapshot)
         return result_config
 
+    @staticmethod
+    def __hash_file(file_path: str) -> Optional[str]:
+        try:
+            with open(file_path, 'rb') as f:
+                return hashlib.sha256(f.read()).hexdigest()
+        except OSError:
+            return None
+
     def save(
             self,
             encoding: str = 'utf8',
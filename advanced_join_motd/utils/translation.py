@@ -1,42 +1,82 @@
+import functools
+import hashlib
 import json
+import os
 import re
-from typing import Union, Optional, List, Dict
+import time
+from typing import Union, Optional, List, Dict, Tuple, Pattern
 
 from mcdreforged.api.rtext import *
+from ruamel import yaml
 
+from advanced_join_motd.utils import file_util
 from advanced_join_motd.utils.misc import psi
 
 MessageText: type = Union[str, RTextBase]
 TRANSLATION_KEY_PREFIX = psi.get_self_metadata().id + '.'
 
+_MISSING = object()
+# (key, requested language, MCDR language) -> language that contains the key, or _MISSING
+_translation_cache: Dict[Tuple[str, str, str], object] = {}
+# Processed help texts, keyed by (key, language, prefixes, args, kwargs)
+_HELP_CACHE_SIZE = 64
+_help_cache: Dict[tuple, RTextBase] = {}
+
+
+def clear_translation_cache():
+    _translation_cache.clear()
+    _help_cache.clear()
+
 
 def htr(translation_key: str, *args, _lb_htr_prefixes: Optional[List[str]] = None, **kwargs) -> RTextMCDRTranslation:
-    def __get_regex_result(line: str):
-        pattern = r'(?<=§7){}[\S ]*?(?=§)'
-        for prefix_tuple in _lb_htr_prefixes:
-            for prefix in prefix_tuple:
-                result = re.search(pattern.format(prefix), line)
-                if result is not None:
-                    return result
-        return None
+    prefixes = tuple(_lb_htr_prefixes or ())
 
-    def __htr(key: str, *inner_args, **inner_kwargs) -> MessageText:
-        original, processed = ntr(key, *inner_args, **inner_kwargs), []
+    def __htr(key: str, *inner_args, _mcdr_tr_language: Optional[str] = None, **inner_kwargs) -> MessageText:
+        try:
+            cache_key = (key, _mcdr_tr_language, prefixes, inner_args, tuple(sorted(inner_kwargs.items())))
+            hash(cache_key)
+        except TypeError:
+            # Unhashable arguments, e.g. RText
+            cache_key = None
+        if cache_key is not None and cache_key in _help_cache:
+            return _help_cache[cache_key].copy()
+
+        original, processed = ntr(key, *inner_args, _mcdr_tr_language=_mcdr_tr_language, **inner_kwargs), []
         if not isinstance(original, str):
             return key
+        pattern = _get_help_command_pattern(prefixes)
         for line in original.splitlines():
-            result = __get_regex_result(line)
+            result = None if pattern is None else pattern.search(line)
             if result is not None:
                 command = result.group() + ' '
                 processed.append(RText(line).c(RAction.suggest_command, command).h(
                     rtr(f'help.detailed.hover', command)))
             else:
                 processed.append(line)
-        return RTextBase.join('\n', processed)
+        text = RTextBase.join('\n', processed)
+        if cache_key is not None:
+            if len(_help_cache) >= _HELP_CACHE_SIZE:
+                _help_cache.clear()
+            _help_cache[cache_key] = text
+            return text.copy()
+        return text
 
     return rtr(translation_key, *args, **kwargs).set_translator(__htr)
 
 
+@functools.lru_cache(maxsize=16)
+def _get_help_command_pattern(prefixes: Tuple[str, ...]) -> Optional[Pattern]:
+    if len(prefixes) == 0:
+        return None
+    # Longer prefixes first, so one prefix won't shadow another that starts with it
+    alternation = '|'.join(re.escape(prefix) for prefix in sorted(prefixes, key=len, reverse=True))
+    return re.compile(r'(?<=§7)(?:{})[\S ]*?(?=§)'.format(alternation))
+
+
+def clear_help_cache():
+    _help_cache.clear()
+
+
 def rtr(translation_key: str, *args, _lb_rtr_prefix: str = TRANSLATION_KEY_PREFIX, **kwargs) -> RTextMCDRTranslation:
     if not translation_key.startswith(_lb_rtr_prefix):
         translation_key = f"{_lb_rtr_prefix}{translation_key}"
@@ -52,39 +92,48 @@ def ntr(
         _lb_tr_log_error_message: bool = True,
         **kwargs
 ) -> MessageText:
-    try:
-        return psi.tr(
-            translation_key,
-            *args,
-            _mcdr_tr_language=_mcdr_tr_language,
-            _mcdr_tr_allow_failure=False,
-            **kwargs
-        )
-    except (KeyError, ValueError):
-        fallback_language = psi.get_mcdr_language()
-        try:
-            if fallback_language == 'en_us':
-                raise KeyError(translation_key)
-            return psi.tr(
-                translation_key, *args,
-                _mcdr_tr_language='en_us',
-                _mcdr_tr_allow_failure=False,
-                **kwargs
-            )
-        except (KeyError, ValueError):
-            languages = []
-            for item in (_mcdr_tr_language, fallback_language, 'en_us'):
-                if item not in languages:
-                    languages.append(item)
-            languages = ', '.join(languages)
-            if _mcdr_tr_allow_failure:
-                if _lb_tr_log_error_message:
-                    psi.logger.error(f'Error translate text "{translation_key}" to language {languages}')
-                if _lb_tr_default_fallback is None:
-                    return translation_key
-                return _lb_tr_default_fallback
-            else:
-                raise KeyError(f'Translation key "{translation_key}" not found with language {languages}')
+    fallback_language = psi.get_mcdr_language()
+    languages = []
+    for item in (_mcdr_tr_language or fallback_language, fallback_language, 'en_us'):
+        if item not in languages:
+            languages.append(item)
+
+    cache_key = (translation_key, languages[0], fallback_language)
+    resolved = _translation_cache.get(cache_key)
+    if resolved is not _MISSING:
+        # Language known to have this key goes first, the others are still tried in case mappings changed
+        search_order = languages if resolved is None else [resolved] + [item for item in languages if item != resolved]
+        missing = True
+        for language in search_order:
+            try:
+                text = psi.tr(
+                    translation_key,
+                    *args,
+                    _mcdr_tr_language=language,
+                    _mcdr_tr_allow_failure=False,
+                    **kwargs
+                )
+            except KeyError:
+                continue
+            except ValueError:
+                # Arguments don't fit the translated text, the key itself exists
+                missing = False
+                continue
+            if language != resolved:
+                _translation_cache[cache_key] = language
+            return text
+        if missing:
+            _translation_cache[cache_key] = _MISSING
+
+    languages = ', '.join(languages)
+    if _mcdr_tr_allow_failure:
+        if _lb_tr_log_error_message:
+            psi.logger.error(f'Error translate text "{translation_key}" to language {languages}')
+        if _lb_tr_default_fallback is None:
+            return translation_key
+        return _lb_tr_default_fallback
+    else:
+        raise KeyError(f'Translation key "{translation_key}" not found with language {languages}')
 
 
 def ktr(
@@ -137,3 +186,49 @@ def dtr(translation_dict: Dict[str, str], *args, **kwargs) -> RTextMCDRTranslati
                             translation_dict, _mcdr_tr_language, ', '.join(fallback_language)))
 
     return RTextMCDRTranslation('', *args, **kwargs).set_translator(fake_tr)
+
+
+def flatten_translation_mapping(mapping: dict, prefix: str = '') -> Dict[str, str]:
+    flattened = {}
+    for key, value in mapping.items():
+        if isinstance(value, dict):
+            flattened.update(flatten_translation_mapping(value, f'{prefix}{key}.'))
+        else:
+            flattened[f'{prefix}{key}'] = value
+    return flattened
+
+
+def load_compiled_translation(path: str, compiled_folder: str) -> Tuple[Optional[Dict[str, str]], Optional[float]]:
+    """
+    Load a yaml language file through a flattened json file in compiled_folder, recompiled when source file hash changes
+    :return: The flattened mapping, and the parsing time saved in seconds if the compiled file is used
+    """
+    with open(path, 'rb') as f:
+        content = f.read()
+    source_hash = hashlib.sha256(content).hexdigest()
+    compiled_path = os.path.join(compiled_folder, os.path.basename(path) + '.json')
+
+    start = time.perf_counter()
+    try:
+        with open(compiled_path, encoding='utf8') as f:
+            compiled = json.load(f)
+        if compiled['source_hash'] == source_hash:
+            return compiled['translations'], compiled['parse_time'] - (time.perf_counter() - start)
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+
+    start = time.perf_counter()
+    mapping = yaml.YAML(typ='safe').load(content.decode('utf8'))
+    if not isinstance(mapping, dict):
+        return None, None
+    translations = flatten_translation_mapping(mapping)
+    parse_time = time.perf_counter() - start
+    try:
+        # Dumped before opening the file, values json can't hold (e.g. unquoted dates) leave no partial file
+        compiled_content = json.dumps({'source_hash': source_hash, 'parse_time': parse_time, 'translations': translations}, ensure_ascii=False)
+        file_util.ensure_dir(compiled_folder)
+        with file_util.safe_write(compiled_path) as f:
+            f.write(compiled_content)
+    except (OSError, TypeError, ValueError) as exc:
+        psi.logger.warning(f'Failed to save compiled translation file {compiled_path}: {exc}')
+    return translations, None
@@ -0,0 +1,96 @@
+import queue
+import threading
+from typing import Callable, Dict, List
+
+from advanced_join_motd.utils.misc import named_thread, psi
+
+
+class OrderedWorkerPool:
+    """
+    Fixed size thread pool with bounded queues
+    Tasks submitted with the same key always go to the same worker, so they are executed in submitting order
+    """
+    __STOP = object()
+
+    def __init__(self, name: str, worker_count: int, max_queue_size: int):
+        self.__name = name
+        self.__queues: List[queue.Queue] = [queue.Queue(maxsize=max(max_queue_size, 1)) for _ in range(max(worker_count, 1))]
+        self.__threads = []
+        self.__pending: Dict[str, int] = {}
+        self.__pending_lock = threading.Lock()
+        self.__running = False
+        # Set when stopped, workers then exit once their queue is empty even if the stop mark couldn't be queued
+        self.__stopping = False
+        self.__discarding = False
+
+    def start(self):
+        if self.__running:
+            return
+        self.__running = True
+        for num, task_queue in enumerate(self.__queues):
+            self.__threads.append(named_thread(f'{self.__name}{num}')(self.__work)(task_queue))
+
+    def stop(self, drain: bool = False):
+        """
+        :param drain: Let workers finish queued tasks before exiting, or discard them
+        """
+        self.__running = False
+        self.__discarding = not drain
+        self.__stopping = True
+        for task_queue in self.__queues:
+            while not drain:
+                try:
+                    item = task_queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is not self.__STOP:
+                    self.__done(item[0])
+            try:
+                # Never blocks a reload or unload behind a full queue
+                task_queue.put_nowait(self.__STOP)
+            except queue.Full:
+                pass
+        self.__threads.clear()
+
+    def has_pending(self, key: str) -> bool:
+        with self.__pending_lock:
+            return self.__pending.get(key, 0) > 0
+
+    def submit(self, key: str, task: Callable[[], None]) -> bool:
+        """
+        :return: False if the pool is not running or the target worker queue is full
+        """
+        if not self.__running:
+            return False
+        task_queue = self.__queues[hash(key) % len(self.__queues)]
+        with self.__pending_lock:
+            try:
+                task_queue.put_nowait((key, task))
+            except queue.Full:
+                return False
+            self.__pending[key] = self.__pending.get(key, 0) + 1
+        return True
+
+    def __done(self, key: str):
+        with self.__pending_lock:
+            count = self.__pending.get(key, 0) - 1
+            if count > 0:
+                self.__pending[key] = count
+            else:
+                self.__pending.pop(key, None)
+
+    def __work(self, task_queue: queue.Queue):
+        while True:
+            item = task_queue.get()
+            if item is self.__STOP:
+                break
+            key, task = item
+            try:
+                if not self.__discarding:
+                    task()
+            except Exception as exc:
+                psi.logger.exception(f'Error running task for {key} in {threading.current_thread().name}', exc_info=exc)
+            finally:
+                self.__done(key)
+            if self.__stopping and task_queue.empty():
+                break
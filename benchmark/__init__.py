@@ -0,0 +1,6 @@
+"""
+Benchmark of the join path, run from the repository root with ``python -m benchmark``
+
+The plugin runs against a stand-in PluginServerInterface with synthetic schemes and join lines,
+so results of different versions can be compared without a Minecraft server
+"""
@@ -0,0 +1,114 @@
+import argparse
+import json
+import logging
+import os
+import shutil
+import sys
+import time
+
+from benchmark.fake_server import ROOT, FakePlayerCommandSource, FakePluginServerInterface, make_command_info, make_join_info
+from benchmark.runner import BenchmarkResult, run_suite
+from benchmark.synthetic import SchemeCost, make_player_names, make_scheme_classes
+
+SUITES = ('join', 'preview', 'config')
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(prog='python -m benchmark', description='Benchmark the join path of Advanced Join MOTD')
+    parser.add_argument('--suites', default=','.join(SUITES), help=f'Comma separated suites to run, from {", ".join(SUITES)}')
+    parser.add_argument('--ops', type=int, default=2000, help='Operations measured per suite')
+    parser.add_argument('--warmup', type=int, default=200, help='Operations run before measuring')
+    parser.add_argument('--schemes', type=int, default=20, help='Count of synthetic schemes')
+    parser.add_argument('--players', type=int, default=500, help='Count of distinct players joining')
+    parser.add_argument('--enabled-ratio', type=float, default=0.05, help='Ratio of players each scheme is enabled for')
+    parser.add_argument('--enabled-cost', type=float, default=2, help='Microseconds spent in each is_enabled call')
+    parser.add_argument('--render-cost', type=float, default=50, help='Microseconds spent in each get_scheme_text call')
+    parser.add_argument('--cache', default='none', choices=('none', 'global', 'player', 'language'), help='Cache scope of synthetic schemes')
+    parser.add_argument('--generation', default='sync', choices=('sync', 'async', 'batch'), help='How joins are generated')
+    parser.add_argument('--json', dest='json_path', help='Also write results to this file, for comparing versions')
+    return parser.parse_args()
+
+
+def wait_until(predicate, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            raise TimeoutError('Queued joins were not delivered in time')
+        time.sleep(0.001)
+
+
+def main():
+    args = parse_args()
+    suites = [item.strip() for item in args.suites.split(',') if item.strip()]
+    for suite in suites:
+        if suite not in SUITES:
+            sys.exit(f'Unknown suite: {suite}')
+
+    server = FakePluginServerInterface().install()
+    from advanced_join_motd import AdvancedJoinMOTD
+    from advanced_join_motd.config import Configuration
+
+    inst = AdvancedJoinMOTD.get_instance()
+    # Keep output to the results, warnings still show up
+    inst.logger.console_handler.setLevel(logging.WARNING)
+    inst.on_load(server, None)
+    scheme_manager = inst.scheme_manager
+    cost = SchemeCost(args.enabled_ratio, args.enabled_cost, args.render_cost, args.cache)
+    for scheme_class in make_scheme_classes(args.schemes, cost):
+        scheme_manager.register_scheme(scheme_class, server)
+    if args.generation == 'async':
+        inst.config.generation.mode = 'async'
+        scheme_manager.on_config_changed(['generation'])
+    elif args.generation == 'batch':
+        inst.config.join_batching.enabled = True
+        scheme_manager.on_config_changed(['join_batching'])
+
+    players = make_player_names(args.players)
+    join_infos = [make_join_info(player, num) for num, player in enumerate(players)]
+    preview_sources = [
+        FakePlayerCommandSource(server, make_command_info(player, f'{inst.config.primary_prefix} preview'), player)
+        for player in players
+    ]
+
+    results = []
+    try:
+        for suite in suites:
+            if suite == 'join':
+                submitted = [0]
+                told_base = server.told_count
+
+                def join(num: int):
+                    submitted[0] += 1
+                    scheme_manager.on_player_joined(server, players[num % len(players)], join_infos[num % len(players)])
+
+                def finish():
+                    wait_until(lambda: server.told_count - told_base >= submitted[0])
+                results.append(run_suite('join', join, args.ops, args.warmup, finish))
+            elif suite == 'preview':
+                results.append(run_suite('preview', lambda num: inst.command_manager.preview(preview_sources[num % len(players)]), args.ops, args.warmup))
+            elif suite == 'config':
+                # Reading and checking the config file is the same work as a reload without changes
+                results.append(run_suite('config', lambda num: Configuration.load(inst, print_to_console=False), max(args.ops // 10, 1), args.warmup // 10))
+    finally:
+        scheme_manager.on_unload(server)
+
+    print(f'{args.schemes} schemes, {args.players} players, {args.generation} generation, {args.cache} cache')
+    print(BenchmarkResult.HEADER)
+    for result in results:
+        print(result.format_row())
+
+    if args.json_path is not None:
+        with open(os.path.join(ROOT, 'mcdreforged.plugin.json'), encoding='utf8') as f:
+            version = json.load(f)['version']
+        with open(args.json_path, 'w', encoding='utf8') as f:
+            json.dump({
+                'version': version,
+                'python': sys.version.split()[0],
+                'options': vars(args),
+                'results': [result._asdict() for result in results]
+            }, f, indent=2, ensure_ascii=False)
+    shutil.rmtree(server.data_folder, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
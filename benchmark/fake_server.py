@@ -0,0 +1,131 @@
+import logging
+import os
+import tempfile
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional, Tuple
+
+from mcdreforged.api.rtext import RTextBase
+from mcdreforged.api.types import Info, InfoSource, PlayerCommandSource, ServerInterface
+from ruamel import yaml
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class FakePluginServerInterface:
+    """
+    Stand-in PluginServerInterface of this plugin, with nothing but what the plugin calls
+    Told messages are serialized like the real server would do, then counted
+    """
+    def __init__(self, data_folder: Optional[str] = None):
+        self.data_folder = data_folder or tempfile.mkdtemp(prefix='ajm_benchmark_')
+        self.logger = logging.getLogger('AdvancedJoinMOTD.benchmark')
+        self.translations: Dict[str, Dict[str, str]] = {}
+        self.listeners: List[Tuple[Any, Any]] = []
+        self.told_count = 0
+        self.__metadata = SimpleNamespace(id='advanced_join_motd', name='Advanced Join MOTD', version='benchmark')
+        safe_yaml = yaml.YAML(typ='safe')
+        lang_folder = os.path.join(ROOT, 'lang')
+        for file in os.listdir(lang_folder):
+            with open(os.path.join(lang_folder, file), encoding='utf8') as f:
+                self.register_translation(os.path.splitext(file)[0], safe_yaml.load(f))
+
+    def install(self) -> "FakePluginServerInterface":
+        # Must be done before importing advanced_join_motd, which creates the plugin instance on import
+        ServerInterface._ServerInterface__global_instance = self
+        return self
+
+    def as_plugin_server_interface(self):
+        return self
+
+    def get_self_metadata(self):
+        return self.__metadata
+
+    def get_plugin_metadata(self, plugin_id: str):
+        return SimpleNamespace(id=plugin_id, version='benchmark')
+
+    def get_server_information(self):
+        return SimpleNamespace(version='benchmark', ip=None, port=None)
+
+    def is_server_startup(self) -> bool:
+        # No players online before the benchmark joins them
+        return False
+
+    def get_data_folder(self) -> str:
+        return self.data_folder
+
+    def get_mcdr_language(self) -> str:
+        return 'en_us'
+
+    def get_preference(self, obj):
+        return SimpleNamespace(language='en_us')
+
+    def get_permission_level(self, obj) -> int:
+        return hash(obj) % 5
+
+    def open_bundled_file(self, path: str):
+        return open(os.path.join(ROOT, path), 'rb')
+
+    def register_translation(self, language: str, mapping: dict):
+        def flatten(data: dict, prefix: str):
+            for key, value in data.items():
+                if isinstance(value, dict):
+                    flatten(value, f'{prefix}{key}.')
+                else:
+                    self.translations.setdefault(language, {})[f'{prefix}{key}'] = value
+        flatten(mapping, '')
+
+    def tr(self, key: str, *args, _mcdr_tr_language: Optional[str] = None, _mcdr_tr_allow_failure: bool = True, **kwargs):
+        text = self.translations.get(_mcdr_tr_language or 'en_us', {}).get(key)
+        if text is None:
+            if _mcdr_tr_allow_failure:
+                return key
+            raise KeyError(key)
+        if any(isinstance(item, RTextBase) for item in list(args) + list(kwargs.values())):
+            return RTextBase.format(text, *args, **kwargs)
+        return text.format(*args, **kwargs)
+
+    def register_event_listener(self, event, callback, priority: Optional[int] = None):
+        self.listeners.append((event, callback))
+
+    def register_command(self, *args, **kwargs):
+        pass
+
+    def register_help_message(self, *args, **kwargs):
+        pass
+
+    def reload_plugin(self, plugin_id: str):
+        pass
+
+    def tell(self, player: str, text, encoding: Optional[str] = None):
+        RTextBase.from_any(text).to_json_str()
+        self.told_count += 1
+
+
+class FakePlayerCommandSource(PlayerCommandSource):
+    def __init__(self, server: FakePluginServerInterface, info: Info, player: str):
+        self._mcdr_server = None
+        self._InfoCommandSource__info = info
+        self.player = player
+        self.__server = server
+
+    def get_server(self):
+        return self.__server
+
+    def get_permission_level(self) -> int:
+        return 4
+
+    def get_preference(self):
+        return self.__server.get_preference(self)
+
+    def reply(self, message, **kwargs):
+        self.__server.tell(self.player, message)
+
+
+def make_join_info(player: str, entity_id: int) -> Info:
+    content = f'{player}[/127.0.0.1:{20000 + entity_id % 40000}] logged in with entity id {entity_id} at ({entity_id % 100}.5, 64.0, -{entity_id % 50}.5)'
+    return Info(InfoSource.SERVER, f'[12:00:00] [Server thread/INFO]: {content}', content=content)
+
+
+def make_command_info(player: str, command: str) -> Info:
+    content = f'<{player}> {command}'
+    return Info(InfoSource.SERVER, f'[12:00:00] [Server thread/INFO]: {content}', content=command, player=player)
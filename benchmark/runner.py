@@ -0,0 +1,81 @@
+import gc
+import time
+import tracemalloc
+from typing import Callable, List, NamedTuple, Optional
+
+
+class BenchmarkResult(NamedTuple):
+    suite: str
+    ops: int
+    p50_us: float
+    p99_us: float
+    ops_per_sec: float
+    # Mean of memory allocated at the high-water mark of each operation
+    alloc_kib_per_op: float
+    # Memory still held after all operations, e.g. cache entries
+    retained_kib: float
+
+    HEADER = f'{"suite":<14}{"ops":>8}{"p50 (us)":>12}{"p99 (us)":>12}{"ops/s":>12}{"alloc/op (KiB)":>16}{"retained (KiB)":>16}'
+
+    def format_row(self) -> str:
+        return f'{self.suite:<14}{self.ops:>8}{self.p50_us:>12.1f}{self.p99_us:>12.1f}{self.ops_per_sec:>12.0f}{self.alloc_kib_per_op:>16.2f}{self.retained_kib:>16.1f}'
+
+
+def percentile(sorted_values: List[float], ratio: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * ratio))]
+
+
+def run_suite(suite: str, operation: Callable[[int], None], ops: int, warmup: int, finish: Optional[Callable[[], None]] = None) -> BenchmarkResult:
+    """
+    Time operation(0..ops-1) one by one, then run them again under tracemalloc for allocations
+    :param finish: Waits for work queued by the operations, included in throughput but not in latency
+    """
+    for num in range(warmup):
+        operation(num)
+    if finish is not None:
+        finish()
+
+    gc.collect()
+    latencies = []
+    start = time.perf_counter()
+    for num in range(ops):
+        op_start = time.perf_counter_ns()
+        operation(num)
+        latencies.append((time.perf_counter_ns() - op_start) / 1000)
+    if finish is not None:
+        finish()
+    elapsed = time.perf_counter() - start
+
+    # Separated from timing, tracing slows everything down
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        allocated = 0
+        # Python 3.8 has no reset_peak(), only memory still held after each operation is counted there
+        track_peak = hasattr(tracemalloc, 'reset_peak')
+        for num in range(ops):
+            current, _ = tracemalloc.get_traced_memory()
+            if track_peak:
+                tracemalloc.reset_peak()
+            operation(num)
+            current_after, peak = tracemalloc.get_traced_memory()
+            allocated += max((peak if track_peak else current_after) - current, 0)
+        if finish is not None:
+            finish()
+        after, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    latencies.sort()
+    return BenchmarkResult(
+        suite=suite,
+        ops=ops,
+        p50_us=percentile(latencies, 0.5),
+        p99_us=percentile(latencies, 0.99),
+        ops_per_sec=ops / elapsed if elapsed > 0 else 0.0,
+        alloc_kib_per_op=allocated / ops / 1024 if ops else 0.0,
+        retained_kib=(after - before) / 1024
+    )
@@ -0,0 +1,63 @@
+import time
+import zlib
+from typing import List, NamedTuple, Type
+
+from mcdreforged.api.rtext import RText
+
+
+class SchemeCost(NamedTuple):
+    enabled_ratio: float
+    # Microseconds spent in each call, busy waiting like a scheme doing real work
+    enabled_cost: float
+    render_cost: float
+    cache: str
+
+
+def spin(microseconds: float):
+    if microseconds <= 0:
+        return
+    deadline = time.perf_counter() + microseconds / 1e6
+    while time.perf_counter() < deadline:
+        pass
+
+
+def make_scheme_classes(count: int, cost: SchemeCost) -> List[Type]:
+    """
+    count schemes, each enabled for about enabled_ratio of players, plus a fallback scheme enabled for everyone
+    """
+    from advanced_join_motd.api import AbstractJoinMOTDScheme, CacheScope, JoinContext
+
+    threshold = int(cost.enabled_ratio * 1000)
+    cache_scope = CacheScope(cost.cache)
+
+    def make(index: int, always_enabled: bool = False):
+        name = 'synthetic_fallback' if always_enabled else f'synthetic_{index}'
+
+        class SyntheticScheme(AbstractJoinMOTDScheme):
+            @staticmethod
+            def get_name() -> str:
+                return name
+
+            @staticmethod
+            def get_priority() -> int:
+                return index
+
+            @staticmethod
+            def get_cache_scope():
+                return cache_scope
+
+            def is_enabled(self, context: JoinContext) -> bool:
+                spin(cost.enabled_cost)
+                return always_enabled or zlib.crc32(f'{name}:{context.player}'.encode()) % 1000 < threshold
+
+            def get_scheme_text(self, context: JoinContext):
+                spin(cost.render_cost)
+                return RText(f'Welcome, {context.player}! This is {name}')
+
+        return SyntheticScheme
+
+    return [make(index + 1) for index in range(count)] + [make(-1, always_enabled=True)]
+
+
+def make_player_names(count: int) -> List[str]:
+    return [f'Player_{index:05d}' for index in range(count)]